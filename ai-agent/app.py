@@ -1,19 +1,51 @@
 import os
-import asyncio
+import uuid
 from typing import Optional
 from datetime import datetime, timedelta
 
-from flask import Flask, request, jsonify, make_response
-from flask_cors import CORS
+import orjson
+import uvicorn
+from quart import Quart, request, jsonify, make_response
+from quart.json.provider import DefaultJSONProvider
 
 # Import agent components
-from main import OptimizedWeb3ResearchAgent, ResearchRequest, init_http_client, http_client
+from main import research_agent, ResearchRequest, detect_greeting, init_http_client, warm_http_client, close_http_client
 
 
-def create_app() -> Flask:
-    app = Flask(__name__)
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson for faster (de)serialization of research payloads."""
 
-    # Configure CORS explicitly for API routes
+    def dumpb(self, obj, newline: bool = False) -> bytes:
+        """Serialize straight to UTF-8 bytes, optionally newline-terminated."""
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_APPEND_NEWLINE if newline else 0)
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumpb(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Hand orjson's bytes to the response as-is instead of decoding to str
+        # and letting the response re-encode it
+        # Same argument rules as jsonify(): one value as-is, several as a list,
+        # or keyword arguments as an object
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (list(args) if args else kwargs or None)
+        return self._app.response_class(self.dumpb(obj, newline=True), mimetype=self.mimetype)
+
+
+def create_app() -> Quart:
+    app = Quart(__name__)
+    app.json = OrjsonProvider(app)
+
+    # One process-wide agent (LLM client, tools, prompt chain); per-request
+    # conversation state lives in the session manager
+    app.extensions["agent"] = research_agent
+
+    # CORS for API routes is handled entirely by _cors_after_request below
     allowed_origins_env = os.getenv("ALLOWED_ORIGINS", "*")
     allowed_origins = (
         "*"
@@ -21,68 +53,81 @@ def create_app() -> Flask:
         else [o.strip() for o in allowed_origins_env.split(",") if o.strip()]
     )
 
-    CORS(
-        app,
-        origins=allowed_origins,
-        methods=["GET", "POST", "OPTIONS"],
-        allow_headers=["Content-Type", "Authorization"],
-        supports_credentials=False,
-        send_wildcard=True,
-        vary_header=True,
-        max_age=3600,
-        always_send=True,
+    # Header values are fixed per process, so build them once here
+    common_cors_headers = {
+        "Vary": "Origin",
+        "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+        "Access-Control-Allow-Headers": "Content-Type, Authorization",
+        # Let browsers cache preflight results instead of re-sending OPTIONS per POST
+        "Access-Control-Max-Age": "86400",
+    }
+    static_cors_headers = (
+        {"Access-Control-Allow-Origin": "*", **common_cors_headers}
+        if allowed_origins == "*"
+        else None
     )
+    allowed_origin_set = frozenset(allowed_origins) if static_cors_headers is None else frozenset()
 
     @app.after_request
-    def add_cors_headers(response):
+    async def _cors_after_request(response):
         try:
             # Only apply to API routes
             if request.path.startswith("/api/"):
+                if static_cors_headers is not None:
+                    response.headers.update(static_cors_headers)
+                    return response
                 request_origin = request.headers.get("Origin")
-                # Default to wildcard when allowed_origins is '*'
-                if allowed_origins == "*":
-                    response.headers["Access-Control-Allow-Origin"] = "*"
+                if request_origin and request_origin in allowed_origin_set:
+                    response.headers["Access-Control-Allow-Origin"] = request_origin
+                    response.headers.update(common_cors_headers)
                 else:
-                    if request_origin and isinstance(allowed_origins, list) and request_origin in allowed_origins:
-                        response.headers["Access-Control-Allow-Origin"] = request_origin
-                # Common headers
-                if "Access-Control-Allow-Origin" in response.headers:
+                    # The response still depends on Origin, so shared caches must key on it
                     response.headers["Vary"] = "Origin"
-                    response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-                    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
         except Exception:
             pass
         return response
 
-    # Initialize shared HTTP client once for all requests
-    try:
-        if http_client is None:
-            asyncio.run(init_http_client())
-    except RuntimeError:
-        # Fallback for environments with an existing event loop
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Create a dedicated new loop for initialization
-            new_loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(new_loop)
-            new_loop.run_until_complete(init_http_client())
-            asyncio.set_event_loop(loop)
-        else:
-            loop.run_until_complete(init_http_client())
-
-    @app.route("/api/health", methods=["GET"])
-    def health() -> tuple:
+    async def preflight_response():
+        # CORS headers are attached by _cors_after_request; preflights carry no body
+        return await make_response("", 204)
+
+    async def read_json_object() -> Optional[dict]:
+        """Parse the request body, or return None unless it is a JSON object"""
+        try:
+            payload = orjson.loads(await request.get_data())
+        except orjson.JSONDecodeError:
+            return None
+        return payload if isinstance(payload, dict) else None
+
+    def bad_body_response() -> tuple:
+        return jsonify({"success": False, "error": "Request body must be a JSON object"}), 400
+
+    # Bind the shared HTTP client to the server's event loop, then pre-connect
+    # to the upstream APIs in the background so a slow host can't hold up startup
+    @app.before_serving
+    async def startup_http_client():
+        await init_http_client()
+        app.add_background_task(warm_http_client)
+
+    @app.after_serving
+    async def shutdown_http_client():
+        await close_http_client()
+
+    @app.route("/api/health", methods=["GET"], provide_automatic_options=False)
+    async def health() -> tuple:
         return jsonify({"status": "ok"}), 200
 
     # Explicit preflight handlers to ensure CORS headers on OPTIONS
     @app.route("/api/health", methods=["OPTIONS"])
-    def health_preflight():
-        return make_response("", 200)
+    async def health_preflight():
+        return await preflight_response()
 
-    @app.route("/api/research", methods=["POST"])
-    def research_route():
+    @app.route("/api/research", methods=["POST"], provide_automatic_options=False)
+    async def research_route():
+        payload = await read_json_object()
+        if payload is None:
+            return bad_body_response()
         try:
-            payload = request.get_json(force=True) or {}
             query: str = payload.get("query", "")
             address: Optional[str] = payload.get("address")
             time_range: str = payload.get("time_range", "7d")
@@ -91,40 +136,64 @@ def create_app() -> Flask:
             if not query or not isinstance(query, str):
                 return jsonify({"success": False, "error": "Field 'query' (string) is required"}), 400
 
-            # Create agent with session support for conversation memory
-            agent = OptimizedWeb3ResearchAgent(session_id=session_id)
+            agent = app.extensions["agent"]
 
-            async def run_research():
-                req = ResearchRequest(query=query, address=address, time_range=time_range, session_id=session_id)
-                return await agent.research(req)
+            # Greetings are answered from canned replies; skip the research pipeline
+            if detect_greeting(query):
+                result = await agent.respond_to_greeting(query, session_id or str(uuid.uuid4()))
+                return jsonify(result), 200
 
-            # Execute the coroutine
-            try:
-                result = asyncio.run(run_research())
-            except RuntimeError:
-                # If we're already in an event loop (e.g., in some WSGI setups), use a new loop
-                loop = asyncio.new_event_loop()
-                try:
-                    asyncio.set_event_loop(loop)
-                    result = loop.run_until_complete(run_research())
-                finally:
-                    loop.close()
-                    asyncio.set_event_loop(None)
+            # Run on the server's event loop so concurrent requests share I/O
+            req = ResearchRequest(query=query, address=address, time_range=time_range, session_id=session_id)
+            result = await agent.research(req)
 
             # Add session_id to response for client tracking
             if result.get("success"):
-                result["session_id"] = agent.session_id
+                result["session_id"] = req.session_id
 
             return jsonify(result), 200 if result.get("success") else 502
         except Exception as exc:
             return jsonify({"success": False, "error": str(exc)}), 500
 
     @app.route("/api/research", methods=["OPTIONS"])
-    def research_preflight():
-        return make_response("", 200)
+    async def research_preflight():
+        return await preflight_response()
+
+    @app.route("/api/research/stream", methods=["POST"], provide_automatic_options=False)
+    async def research_stream_route():
+        """Stream research progress as newline-delimited JSON events"""
+        payload = await read_json_object()
+        if payload is None:
+            return bad_body_response()
+        query: str = payload.get("query", "")
+        if not query or not isinstance(query, str):
+            return jsonify({"success": False, "error": "Field 'query' (string) is required"}), 400
+
+        agent = app.extensions["agent"]
+        req = ResearchRequest(
+            query=query,
+            address=payload.get("address"),
+            time_range=payload.get("time_range", "7d"),
+            session_id=payload.get("session_id"),
+        )
 
-    @app.route("/api/conversation/<session_id>", methods=["GET"])
-    def get_conversation(session_id: str):
+        async def generate():
+            try:
+                async for event in agent.research_stream(req):
+                    if event["event"] == "result" and event["data"].get("success"):
+                        event["data"]["session_id"] = req.session_id
+                    yield app.json.dumpb(event, newline=True)
+            except Exception as exc:
+                yield app.json.dumpb({"event": "result", "data": {"success": False, "error": str(exc)}}, newline=True)
+
+        return generate(), 200, {"Content-Type": "application/x-ndjson"}
+
+    @app.route("/api/research/stream", methods=["OPTIONS"])
+    async def research_stream_preflight():
+        return await preflight_response()
+
+    @app.route("/api/conversation/<session_id>", methods=["GET"], provide_automatic_options=False)
+    async def get_conversation(session_id: str):
         """Get conversation history for a session"""
         try:
             from main import session_manager
@@ -166,31 +235,32 @@ def create_app() -> Flask:
                 "session_id": session_id,
                 "messages": messages,
                 "message_count": len(messages),
-                "created_at": session["created_at"].isoformat(),
-                "last_activity": session["last_activity"].isoformat()
+                "created_at": session["created_at_iso"],
+                "last_activity": session["last_activity_iso"]
             })
             
         except Exception as exc:
             return jsonify({"success": False, "error": str(exc)}), 500
 
     @app.route("/api/conversation/<session_id>", methods=["OPTIONS"])
-    def conversation_preflight(session_id: str):
-        return make_response("", 200)
+    async def conversation_preflight(session_id: str):
+        return await preflight_response()
 
-    @app.route("/api/sessions", methods=["GET"])
-    def list_sessions():
+    @app.route("/api/sessions", methods=["GET"], provide_automatic_options=False)
+    async def list_sessions():
         """List all active sessions"""
         try:
             from main import session_manager
             
-            sessions = []
-            for session_id, session in session_manager.sessions.items():
-                sessions.append({
+            sessions = [
+                {
                     "session_id": session_id,
                     "message_count": session["message_count"],
-                    "created_at": session["created_at"].isoformat(),
-                    "last_activity": session["last_activity"].isoformat()
-                })
+                    "created_at": session["created_at_iso"],
+                    "last_activity": session["last_activity_iso"]
+                }
+                for session_id, session in session_manager.sessions.items()
+            ]
             
             return jsonify({
                 "success": True,
@@ -202,8 +272,8 @@ def create_app() -> Flask:
             return jsonify({"success": False, "error": str(exc)}), 500
 
     @app.route("/api/sessions", methods=["OPTIONS"])
-    def sessions_preflight():
-        return make_response("", 200)
+    async def sessions_preflight():
+        return await preflight_response()
 
     return app
 
@@ -212,5 +282,13 @@ app = create_app()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8000"))
-    app.run(host="0.0.0.0", port=port, debug=os.getenv("FLASK_DEBUG", "0") == "1")
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        reload=os.getenv("FLASK_DEBUG", "0") == "1",
+    )
 
@@ -1,13 +1,26 @@
 import os
 import asyncio
+import heapq
 import logging
+import math
+import random
 import re
+import threading
+import time
 import uuid
-from typing import Dict, List, Optional, Any, Union
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from functools import lru_cache, wraps
+from itertools import islice
+from types import MappingProxyType
+from typing import AsyncIterator, Dict, List, Mapping, Optional, Any, Tuple, Union
 from datetime import datetime, timedelta
 import json
 
 import httpx
+import orjson
 
 # Modern LangChain imports
 from langchain_core.tools import tool
@@ -21,6 +34,16 @@ from langchain_community.cache import InMemoryCache
 from dotenv import load_dotenv, find_dotenv
 from langchain.globals import set_llm_cache
 
+try:
+    import ahocorasick
+except ImportError:  # Optional C extension; extractors fall back to a regex scan
+    ahocorasick = None
+
+try:
+    import uvloop
+except ImportError:  # Not available on Windows; asyncio's default loop is used
+    uvloop = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,6 +51,10 @@ logger = logging.getLogger(__name__)
 # Set up caching
 set_llm_cache(InMemoryCache())
 
+# Run the CLI and scripts on uvloop; the server gets it from uvicorn's --loop
+if uvloop is not None:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
 # =============================
 # Configuration & API Keys
 # =============================
@@ -47,138 +74,103 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 # =============================
 # Greeting Detection & Responses
 # =============================
+# Greetings and casual conversation starters, matched at the start of the query.
+# Each named group is a response category for get_greeting_response.
+_GREETING_RE = re.compile(
+    r"(?:(?P<hello>hi|hello|hey|hiya|howdy)"
+    r"|(?P<morning>good\s+morning)"
+    r"|(?P<afternoon>good\s+afternoon)"
+    r"|(?P<evening>good\s+evening)"
+    r"|(?P<how_are_you>how\s+(?:are|is)\s+you|how're\s+you|how['’]?s\s+(?:it\s+going|everything))"
+    r"|(?P<whats_up>what['’]?s\s+up|wassup|sup)"
+    r"|(?P<thanks>thanks|thank\s+you)"
+    r"|(?P<bye>bye|goodbye|see\s+you|catch\s+you\s+later|take\s+care)"
+    r"|(?P<other>greetings|yo|cheers|good\s+day|how\s+do\s+you\s+do|(?:nice|pleasure)\s+to\s+meet\s+you))\b",
+    re.IGNORECASE,
+)
+
+# First letters of every alternative in _GREETING_RE; anything else cannot match
+_GREETING_STARTS = frozenset("hgwsyctbnp")
+
+# Response pools per greeting category
+_GREETING_RESPONSES: Dict[str, tuple] = {
+    "morning": (
+        "Good morning! ☀️ Ready to dive into some Web3 research today? I can help you analyze crypto markets, track DeFi protocols, or explore blockchain data.",
+        "Morning! 🌅 What crypto insights are you looking for today? I've got access to real-time market data, DeFi analytics, and blockchain metrics.",
+        "Good morning! ⚡ Let's make today productive with some Web3 research. What would you like to explore?",
+    ),
+    "evening": (
+        "Good evening! 🌙 Perfect time to catch up on crypto markets. What Web3 data are you curious about?",
+        "Evening! 🌆 The crypto markets never sleep, and neither do I. How can I help with your research tonight?",
+        "Good evening! ✨ Ready to explore some blockchain insights? I can analyze anything from DeFi yields to market trends.",
+    ),
+    "afternoon": (
+        "Good afternoon! 🌤️ Hope your day is going well! What crypto research can I help you with?",
+        "Afternoon! ☀️ Time for some Web3 analysis? I'm here to help with market data, protocol insights, or blockchain metrics.",
+        "Good afternoon! 🚀 Ready to explore the crypto universe? Let me know what you'd like to research.",
+    ),
+    "how_are_you": (
+        "I'm doing great, thanks for asking! 🤖 My circuits are buzzing with excitement to help you research Web3 data. What's on your crypto curiosity list today?",
+        "Fantastic! 💫 I'm energized and ready to dive into some blockchain analytics. How can I assist with your crypto research?",
+        "I'm excellent! 🔥 Always excited to help explore the fascinating world of Web3. What would you like to analyze today?",
+        "Doing wonderfully! ⚡ My databases are fresh and my APIs are ready. What crypto insights are you looking for?",
+    ),
+    "whats_up": (
+        "Hey there! 👋 Just here monitoring the crypto markets and ready to help with any Web3 research you need!",
+        "Not much, just keeping tabs on DeFi protocols and blockchain metrics! 📊 What's up with you? Any crypto questions?",
+        "Just analyzing the latest market movements! 📈 What brings you here today? Looking for some Web3 insights?",
+        "Hey! 🚀 Just hanging out in the data streams, ready to help you explore the crypto universe. What's on your mind?",
+    ),
+    "thanks": (
+        "You're very welcome! 😊 Happy to help anytime with your Web3 research needs!",
+        "My pleasure! 🌟 Always here when you need crypto insights or blockchain analysis.",
+        "Absolutely! 💙 That's what I'm here for. Feel free to ask about any Web3 topics anytime!",
+        "You're welcome! ⚡ I love helping people navigate the crypto space. Come back anytime!",
+    ),
+    "hello_returning": (
+        "Hey there! 👋 Welcome back! Ready for another round of Web3 research?",
+        "Hello again! 🔄 Great to see you back. What crypto mysteries shall we solve today?",
+        "Hi! 🌟 Nice to have you back for more blockchain exploration. What's your research focus this time?",
+        "Hey! ⚡ Welcome back to the crypto research hub. What are we diving into today?",
+    ),
+    "hello": (
+        "Hello! 👋 Welcome to your Web3 Research Assistant! I can help you analyze crypto markets, DeFi protocols, blockchain data, and much more. What would you like to explore?",
+        "Hi there! 🚀 I'm your AI-powered Web3 researcher. I can access real-time crypto data, analyze market trends, track DeFi yields, and provide comprehensive blockchain insights. What interests you today?",
+        "Hey! 💫 Great to meet you! I specialize in Web3 research and can help with everything from token analysis to DeFi protocol deep-dives. What crypto topic are you curious about?",
+        "Hello! ⚡ I'm here to help you navigate the crypto universe with data-driven insights. Whether it's market analysis, protocol research, or blockchain metrics - I've got you covered. What shall we explore first?",
+    ),
+    "bye": (
+        "Goodbye! 👋 Thanks for exploring Web3 with me today. Come back anytime for more crypto insights!",
+        "Take care! 🌟 Hope the research was helpful. I'll be here whenever you need more blockchain analysis!",
+        "See you later! 🚀 Keep those crypto curiosities coming - I'm always ready to help!",
+        "Farewell! ⚡ May your crypto journey be profitable and your DeFi yields be high! Come back soon!",
+    ),
+    "other": (
+        "Hello! 😊 I'm your Web3 Research Assistant, powered by AI and connected to live crypto data. How can I help you today?",
+        "Hi there! 🤖 Ready to explore the crypto universe together? I can analyze markets, track protocols, and provide blockchain insights!",
+        "Greetings! 🌟 I'm here to help with all your Web3 research needs. What crypto topic interests you today?",
+    ),
+}
+
 def detect_greeting(query: str) -> bool:
     """Detect if the query is a greeting or casual conversation"""
-    query_lower = query.lower().strip()
-    
-    # Common greetings and casual conversation starters
-    greetings = [
-        "hi", "hello", "hey", "hiya", "howdy", "greetings",
-        "good morning", "good afternoon", "good evening", "good day",
-        "what's up", "whats up", "how are you", "how're you", "how are you doing",
-        "how's it going", "hows it going", "how's everything", "hows everything",
-        "nice to meet you", "pleasure to meet you", "thanks", "thank you",
-        "bye", "goodbye", "see you", "catch you later", "take care",
-        "how do you do", "sup", "yo", "cheers"
-    ]
-    
-    # Check for exact matches or if query starts with greeting
-    for greeting in greetings:
-        if query_lower == greeting or query_lower.startswith(greeting + " ") or query_lower.startswith(greeting + ","):
-            return True
-    
-    # Check for greeting patterns
-    greeting_patterns = [
-        r"\b(hi|hello|hey)\b.*",
-        r"good\s+(morning|afternoon|evening|day)",
-        r"how\s+(are|is)\s+you",
-        r"what['']?s\s+up",
-        r"nice\s+to\s+meet\s+you",
-        r"thanks?\s+(you)?",
-        r"thank\s+you"
-    ]
-    
-    for pattern in greeting_patterns:
-        if re.match(pattern, query_lower):
-            return True
-    
-    return False
+    q = query.lstrip()
+    if not q or q[0].lower() not in _GREETING_STARTS:
+        return False
+    return _GREETING_RE.match(q) is not None
 
 def get_greeting_response(query: str, session_context: Dict[str, Any] = None) -> str:
     """Generate appropriate AI greeting responses"""
-    query_lower = query.lower().strip()
-    
     # Check if this is a returning user
     is_returning = session_context and session_context.get("message_count", 0) > 2
     
-    # Morning greetings
-    if any(word in query_lower for word in ["good morning", "morning"]):
-        responses = [
-            "Good morning! ☀️ Ready to dive into some Web3 research today? I can help you analyze crypto markets, track DeFi protocols, or explore blockchain data.",
-            "Morning! 🌅 What crypto insights are you looking for today? I've got access to real-time market data, DeFi analytics, and blockchain metrics.",
-            "Good morning! ⚡ Let's make today productive with some Web3 research. What would you like to explore?"
-        ]
-    
-    # Evening greetings
-    elif any(word in query_lower for word in ["good evening", "evening"]):
-        responses = [
-            "Good evening! 🌙 Perfect time to catch up on crypto markets. What Web3 data are you curious about?",
-            "Evening! 🌆 The crypto markets never sleep, and neither do I. How can I help with your research tonight?",
-            "Good evening! ✨ Ready to explore some blockchain insights? I can analyze anything from DeFi yields to market trends."
-        ]
-    
-    # Afternoon greetings
-    elif any(word in query_lower for word in ["good afternoon", "afternoon"]):
-        responses = [
-            "Good afternoon! 🌤️ Hope your day is going well! What crypto research can I help you with?",
-            "Afternoon! ☀️ Time for some Web3 analysis? I'm here to help with market data, protocol insights, or blockchain metrics.",
-            "Good afternoon! 🚀 Ready to explore the crypto universe? Let me know what you'd like to research."
-        ]
-    
-    # How are you / How's it going
-    elif any(phrase in query_lower for phrase in ["how are you", "how're you", "how's it going", "hows it going", "how are you doing"]):
-        responses = [
-            "I'm doing great, thanks for asking! 🤖 My circuits are buzzing with excitement to help you research Web3 data. What's on your crypto curiosity list today?",
-            "Fantastic! 💫 I'm energized and ready to dive into some blockchain analytics. How can I assist with your crypto research?",
-            "I'm excellent! 🔥 Always excited to help explore the fascinating world of Web3. What would you like to analyze today?",
-            "Doing wonderfully! ⚡ My databases are fresh and my APIs are ready. What crypto insights are you looking for?"
-        ]
-    
-    # What's up
-    elif any(phrase in query_lower for phrase in ["what's up", "whats up", "sup", "wassup"]):
-        responses = [
-            "Hey there! 👋 Just here monitoring the crypto markets and ready to help with any Web3 research you need!",
-            "Not much, just keeping tabs on DeFi protocols and blockchain metrics! 📊 What's up with you? Any crypto questions?",
-            "Just analyzing the latest market movements! 📈 What brings you here today? Looking for some Web3 insights?",
-            "Hey! 🚀 Just hanging out in the data streams, ready to help you explore the crypto universe. What's on your mind?"
-        ]
-    
-    # Thank you
-    elif any(phrase in query_lower for phrase in ["thanks", "thank you"]):
-        responses = [
-            "You're very welcome! 😊 Happy to help anytime with your Web3 research needs!",
-            "My pleasure! 🌟 Always here when you need crypto insights or blockchain analysis.",
-            "Absolutely! 💙 That's what I'm here for. Feel free to ask about any Web3 topics anytime!",
-            "You're welcome! ⚡ I love helping people navigate the crypto space. Come back anytime!"
-        ]
-    
-    # Basic greetings (hi, hello, hey)
-    elif any(word in query_lower for word in ["hi", "hello", "hey", "hiya", "howdy"]):
-        if is_returning:
-            responses = [
-                "Hey there! 👋 Welcome back! Ready for another round of Web3 research?",
-                "Hello again! 🔄 Great to see you back. What crypto mysteries shall we solve today?",
-                "Hi! 🌟 Nice to have you back for more blockchain exploration. What's your research focus this time?",
-                "Hey! ⚡ Welcome back to the crypto research hub. What are we diving into today?"
-            ]
-        else:
-            responses = [
-                "Hello! 👋 Welcome to your Web3 Research Assistant! I can help you analyze crypto markets, DeFi protocols, blockchain data, and much more. What would you like to explore?",
-                "Hi there! 🚀 I'm your AI-powered Web3 researcher. I can access real-time crypto data, analyze market trends, track DeFi yields, and provide comprehensive blockchain insights. What interests you today?",
-                "Hey! 💫 Great to meet you! I specialize in Web3 research and can help with everything from token analysis to DeFi protocol deep-dives. What crypto topic are you curious about?",
-                "Hello! ⚡ I'm here to help you navigate the crypto universe with data-driven insights. Whether it's market analysis, protocol research, or blockchain metrics - I've got you covered. What shall we explore first?"
-            ]
-    
-    # Goodbye
-    elif any(word in query_lower for word in ["bye", "goodbye", "see you", "catch you later", "take care"]):
-        responses = [
-            "Goodbye! 👋 Thanks for exploring Web3 with me today. Come back anytime for more crypto insights!",
-            "Take care! 🌟 Hope the research was helpful. I'll be here whenever you need more blockchain analysis!",
-            "See you later! 🚀 Keep those crypto curiosities coming - I'm always ready to help!",
-            "Farewell! ⚡ May your crypto journey be profitable and your DeFi yields be high! Come back soon!"
-        ]
-    
-    # Default friendly response
-    else:
-        responses = [
-            "Hello! 😊 I'm your Web3 Research Assistant, powered by AI and connected to live crypto data. How can I help you today?",
-            "Hi there! 🤖 Ready to explore the crypto universe together? I can analyze markets, track protocols, and provide blockchain insights!",
-            "Greetings! 🌟 I'm here to help with all your Web3 research needs. What crypto topic interests you today?"
-        ]
+    match = _GREETING_RE.match(query.strip())
+    category = match.lastgroup if match else "other"
+    if category == "hello" and is_returning:
+        category = "hello_returning"
     
     # Return a random response from the appropriate category
-    import random
-    return random.choice(responses)
+    return random.choice(_GREETING_RESPONSES[category])
 
 # =============================
 # Data Models
@@ -198,64 +190,79 @@ class ConversationSessionManager:
     """Manages conversation sessions with memory"""
     
     def __init__(self, max_sessions: int = 100, session_timeout_hours: int = 24):
-        self.sessions: Dict[str, Dict[str, Any]] = {}
+        # Ordered by last activity (least recent first) so cleanup only inspects the head
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
         self.max_sessions = max_sessions
         self.session_timeout = timedelta(hours=session_timeout_hours)
+        # Guards the sessions container only; each session has its own lock for history
+        self._lock = threading.Lock()
         
     def get_or_create_session(self, session_id: str = None) -> Dict[str, Any]:
         """Get existing session or create new one"""
         if session_id is None:
             session_id = str(uuid.uuid4())
             
-        # Clean up expired sessions
-        self._cleanup_expired_sessions()
-        
-        if session_id not in self.sessions:
-            # Create new session
-            self.sessions[session_id] = {
-                "id": session_id,
-                "chat_history": ChatMessageHistory(),
-                "created_at": datetime.now(),
-                "last_activity": datetime.now(),
-                "message_count": 0,
-                "context_summary": "",
-                "research_context": {}
-            }
-            logger.info(f"Created new conversation session: {session_id}")
-        else:
-            # Update last activity
-            self.sessions[session_id]["last_activity"] = datetime.now()
+        with self._lock:
+            # Clean up expired sessions
+            self._cleanup_expired_sessions()
             
-        return self.sessions[session_id]
+            if session_id not in self.sessions:
+                # Create new session
+                now = datetime.now()
+                now_iso = now.isoformat()
+                self.sessions[session_id] = {
+                    "id": session_id,
+                    "chat_history": ChatMessageHistory(),
+                    "lock": asyncio.Lock(),
+                    "created_at": now,
+                    "last_activity": now,
+                    # Preformatted timestamps for the session listing endpoints
+                    "created_at_iso": now_iso,
+                    "last_activity_iso": now_iso,
+                    "message_count": 0,
+                    "context_summary": "",
+                    "research_context": {}
+                }
+                logger.info(f"Created new conversation session: {session_id}")
+                # Enforce the size limit now that the new session is in place
+                self._evict_overflow_sessions()
+            else:
+                # Update last activity
+                self._touch(self.sessions[session_id])
+                self.sessions.move_to_end(session_id)
+                
+            return self.sessions[session_id]
     
     def update_session_context(self, session_id: str, context: Dict[str, Any]):
         """Update session context with research data"""
-        if session_id in self.sessions:
-            self.sessions[session_id]["research_context"].update(context)
-            self.sessions[session_id]["last_activity"] = datetime.now()
+        with self._lock:
+            if session_id in self.sessions:
+                self.sessions[session_id]["research_context"].update(context)
+                self._touch(self.sessions[session_id])
+                self.sessions.move_to_end(session_id)
+    
+    @staticmethod
+    def _touch(session: Dict[str, Any]):
+        """Bump last activity, keeping the cached ISO string in sync"""
+        now = datetime.now()
+        session["last_activity"] = now
+        session["last_activity_iso"] = now.isoformat()
     
     def _cleanup_expired_sessions(self):
         """Remove expired sessions"""
         current_time = datetime.now()
-        expired_sessions = [
-            session_id for session_id, session in self.sessions.items()
-            if current_time - session["last_activity"] > self.session_timeout
-        ]
-        
-        for session_id in expired_sessions:
-            del self.sessions[session_id]
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if current_time - session["last_activity"] <= self.session_timeout:
+                break
+            self.sessions.popitem(last=False)
             logger.info(f"Cleaned up expired session: {session_id}")
-        
-        # If we have too many sessions, remove oldest ones
-        if len(self.sessions) > self.max_sessions:
-            sorted_sessions = sorted(
-                self.sessions.items(),
-                key=lambda x: x[1]["last_activity"]
-            )
-            sessions_to_remove = len(self.sessions) - self.max_sessions
-            for session_id, _ in sorted_sessions[:sessions_to_remove]:
-                del self.sessions[session_id]
-                logger.info(f"Cleaned up old session due to limit: {session_id}")
+    
+    def _evict_overflow_sessions(self):
+        """Remove least recently active sessions beyond max_sessions"""
+        while len(self.sessions) > self.max_sessions:
+            session_id, _ = self.sessions.popitem(last=False)
+            logger.info(f"Cleaned up old session due to limit: {session_id}")
     
     def get_conversation_summary(self, session_id: str, max_messages: int = 10) -> str:
         """Generate a summary of recent conversation for context"""
@@ -263,17 +270,21 @@ class ConversationSessionManager:
             return ""
             
         chat_history = self.sessions[session_id]["chat_history"]
-        messages = chat_history.messages[-max_messages:] if chat_history.messages else []
+        # Walk back from the newest message instead of copying a tail slice
+        messages = list(islice(reversed(chat_history.messages), max_messages))
         
         if not messages:
             return ""
+        messages.reverse()
         
         summary_parts = []
         for msg in messages:
+            content = msg.content
+            preview = content if len(content) <= 100 else content[:100]
             if isinstance(msg, HumanMessage):
-                summary_parts.append(f"User asked: {msg.content[:100]}...")
+                summary_parts.append(f"User asked: {preview}...")
             elif isinstance(msg, AIMessage):
-                summary_parts.append(f"AI responded about: {msg.content[:100]}...")
+                summary_parts.append(f"AI responded about: {preview}...")
         
         return "\n".join(summary_parts)
 
@@ -283,12 +294,12 @@ session_manager = ConversationSessionManager()
 # =============================
 # Globals
 # =============================
-http_client: Optional[httpx.AsyncClient] = None
-# Track the event loop that created the HTTP client to avoid cross-loop usage
-_http_client_loop_id: Optional[int] = None
+# One shared HTTP client per running event loop; an entry goes away with its loop,
+# so a client is never used from a loop other than the one it was created on
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
 
-# Common asset and chain mappings for parsing queries
-ASSET_NAME_TO_COINGECKO: Dict[str, str] = {
+# Common asset and chain mappings for parsing queries (read-only)
+ASSET_NAME_TO_COINGECKO: Mapping[str, str] = MappingProxyType({
     "bitcoin": "coingecko:bitcoin",
     "btc": "coingecko:bitcoin",
     "ethereum": "coingecko:ethereum",
@@ -307,78 +318,293 @@ ASSET_NAME_TO_COINGECKO: Dict[str, str] = {
     "matic": "coingecko:matic-network",
     "avalanche": "coingecko:avalanche-2",
     "avax": "coingecko:avalanche-2",
-}
+})
 
-ASSET_NAME_TO_SYMBOL: Dict[str, str] = {
+ASSET_NAME_TO_SYMBOL: Mapping[str, str] = MappingProxyType({
     "bitcoin": "BTC", "btc": "BTC",
     "ethereum": "ETH", "eth": "ETH",
     "solana": "SOL", "sol": "SOL",
     "chainlink": "LINK", "link": "LINK",
     "tether": "USDT", "usdt": "USDT",
     "usd coin": "USDC", "usdc": "USDC",
-}
+})
+
+# Coin names and tickers coinmarketcap_tool recognizes, in match-priority order
+CMC_NAME_TO_SYMBOL: Mapping[str, str] = MappingProxyType({
+    "bitcoin": "BTC", "btc": "BTC",
+    "ethereum": "ETH", "eth": "ETH",
+    "cardano": "ADA", "ada": "ADA",
+    "solana": "SOL", "sol": "SOL",
+    "polkadot": "DOT", "dot": "DOT",
+    "chainlink": "LINK", "link": "LINK",
+    "litecoin": "LTC", "ltc": "LTC",
+    "dogecoin": "DOGE", "doge": "DOGE",
+    "ripple": "XRP", "xrp": "XRP",
+    "binance coin": "BNB", "bnb": "BNB",
+    "polygon": "MATIC", "matic": "MATIC",
+    "avalanche": "AVAX", "avax": "AVAX",
+    "tether": "USDT", "usdt": "USDT",
+    "usd coin": "USDC", "usdc": "USDC",
+})
+_CMC_KNOWN_SYMBOLS = frozenset(CMC_NAME_TO_SYMBOL.values())
+_CMC_TOKEN_RE = re.compile(r"[A-Za-z]{2,10}")
 
-SUPPORTED_CHAINS: List[str] = [
+SUPPORTED_CHAINS: Tuple[str, ...] = (
     "ethereum", "arbitrum", "optimism", "polygon", "bsc", "avalanche",
     "solana", "base", "fantom", "zksync", "tron", "linea"
-]
+)
 
 
 # =============================
 # Helpers
 # =============================
+class _RegexMatcher:
+    """Stdlib stand-in for an Aho-Corasick automaton built on one compiled alternation"""
+    
+    def __init__(self, keys):
+        keys = list(keys)
+        self._ranks = {key: rank for rank, key in enumerate(keys)}
+        alternation = "|".join(map(re.escape, sorted(keys, key=len, reverse=True)))
+        # Zero-width lookahead matches at every offset, so overlapping keys are still reported
+        self._pattern = re.compile(f"(?=({alternation}))")
+    
+    def iter(self, text: str):
+        for match in self._pattern.finditer(text):
+            key = match.group(1)
+            yield match.start() + len(key) - 1, (self._ranks[key], key)
+
+
+def _build_automaton(keys):
+    """Substring matcher mapping each key to its (rank, key) in iteration order"""
+    if ahocorasick is None:
+        return _RegexMatcher(keys)
+    automaton = ahocorasick.Automaton()
+    for rank, key in enumerate(keys):
+        automaton.add_word(key, (rank, key))
+    automaton.make_automaton()
+    return automaton
+
+
+class _KeywordClassifier:
+    """Report which keyword categories occur in a text, in a single substring scan"""
+    
+    def __init__(self, categories: Dict[str, tuple]):
+        owners: Dict[str, set] = {}
+        for category, keywords in categories.items():
+            for keyword in keywords:
+                owners.setdefault(keyword, set()).add(category)
+        # A matcher may report only the longest keyword at an offset ("dex volume"
+        # hides "dex"), so fold in the categories of every keyword it contains
+        self._owners: Dict[str, frozenset] = {
+            keyword: frozenset(c for other, cats in owners.items() if other in keyword for c in cats)
+            for keyword in owners
+        }
+        self._matcher = _build_automaton(self._owners)
+    
+    def classify(self, text: str) -> set:
+        categories = set()
+        for _, (_, keyword) in self._matcher.iter(text.lower()):
+            categories |= self._owners[keyword]
+        return categories
+
+
+# Single-pass substring matchers over the asset and chain vocabularies
+_ASSET_AUTOMATON = _build_automaton(ASSET_NAME_TO_COINGECKO)
+_CHAIN_AUTOMATON = _build_automaton(SUPPORTED_CHAINS)
+_CMC_SYMBOL_AUTOMATON = _build_automaton(CMC_NAME_TO_SYMBOL)
+
+# Some endpoints expect capitalized chain names (e.g., historicalChainTvl)
+_CHAIN_CANONICAL: Dict[str, str] = {
+    ch: ("BSC" if ch == "bsc" else ch.capitalize()) for ch in SUPPORTED_CHAINS
+}
+
+
 def extract_known_coingecko_assets(text: str) -> List[str]:
-    lowered = (text or "").lower()
-    found: List[str] = []
-    for key, ident in ASSET_NAME_TO_COINGECKO.items():
-        if key in lowered and ident not in found:
-            found.append(ident)
-    return found
+    # Fresh list per call; callers may extend it
+    return list(_extract_assets_lowered((text or "").lower()))
+
+
+@lru_cache(maxsize=4096)
+def _extract_assets_lowered(lowered: str) -> tuple:
+    # Hits arrive in text order; sort by mapping rank to keep the mapping's output order
+    hits = sorted({value for _, value in _ASSET_AUTOMATON.iter(lowered)})
+    return tuple(dict.fromkeys(ASSET_NAME_TO_COINGECKO[key] for _, key in hits))
 
 
 def extract_chain_from_text(text: str) -> Optional[str]:
-    lowered = (text or "").lower()
-    for ch in SUPPORTED_CHAINS:
-        if ch in lowered:
-            # Some endpoints expect capitalized (e.g., historicalChainTvl), keep prior behavior
-            return ch.capitalize() if ch != "bsc" else "BSC"
-    return None
+    return _extract_chain_lowered((text or "").lower())
+
+
+@lru_cache(maxsize=4096)
+def _extract_chain_lowered(lowered: str) -> Optional[str]:
+    hit = min((value for _, value in _CHAIN_AUTOMATON.iter(lowered)), default=None)
+    if hit is None:
+        return None
+    return _CHAIN_CANONICAL[hit[1]]
 
  
+# [wall-clock second, ISO string] for _iso_now
+_iso_cache: List[Any] = [0.0, ""]
+
+
+def _iso_now() -> str:
+    """Current local time in ISO format, re-rendered at most once per second."""
+    now = time.time()
+    if now - _iso_cache[0] >= 1.0:
+        _iso_cache[0] = now
+        _iso_cache[1] = datetime.fromtimestamp(now).isoformat()
+    return _iso_cache[1]
+
+
+def _first(record: Dict[str, Any], keys: Tuple[str, ...], default: Any = None) -> Any:
+    """Return the first truthy value among ``keys`` in record, like chained ``.get() or``."""
+    for key in keys:
+        value = record.get(key)
+        if value:
+            return value
+    return default
+
+
+class _TTLCache:
+    """Bounded LRU mapping whose entries each expire after their own TTL."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Per-loop registries of per-key locks: key -> [lock, tasks holding or awaiting it]
+_KeyedLocks = "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, List[Any]]]"
+
+
+@asynccontextmanager
+async def _keyed_lock(registry: _KeyedLocks, key: str):
+    """Hold the lock for ``key`` on the running loop, dropping it once no task uses it."""
+    locks = registry.setdefault(asyncio.get_running_loop(), {})
+    entry = locks.get(key)
+    if entry is None:
+        entry = locks[key] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del locks[key]
+
+
+# Per-loop registry of in-flight _single_flight calls, keyed by function and arguments
+_inflight_calls: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, bytes], asyncio.Future]]" = weakref.WeakKeyDictionary()
+
+
+def _single_flight(func):
+    """Let concurrent identical calls of an async function share one execution.
+    
+    Callers receive shallow copies of the shared dict result. The shared call
+    is shielded, so one caller timing out does not cancel it for the others.
+    """
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        key = (func.__name__, orjson.dumps([args, kwargs], default=str, option=orjson.OPT_SORT_KEYS))
+        inflight = _inflight_calls.setdefault(asyncio.get_running_loop(), {})
+        future = inflight.get(key)
+        if future is None:
+            future = inflight[key] = asyncio.ensure_future(func(*args, **kwargs))
+            future.add_done_callback(lambda _: inflight.pop(key, None))
+        result = await asyncio.shield(future)
+        return dict(result) if isinstance(result, dict) else result
+    return wrapper
+
+
+# The _fmt_* helpers coerce to float, then memoize the formatting on that
+# float; report tables repeat the same prices and totals across many rows.
+
+# Thousands-separated fixed-point format specs for the common precisions
+_DECIMAL_SPECS: Dict[int, str] = {d: f",.{d}f" for d in range(10)}
+
+
+def _finite_float(value: Any) -> Optional[float]:
+    """Coerce value to a finite float, or None if it is missing, non-numeric, NaN or infinite."""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        numeric = value
+    else:
+        try:
+            numeric = float(value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+    if not math.isfinite(numeric):
+        return None
+    # Adding 0.0 folds -0.0 into 0.0, which hash alike in the format caches
+    return numeric + 0.0
+
+
 def _fmt_money(value: Any, decimals: int = 2) -> str:
     """Format value as money with $ and commas; return 'N/A' if not numeric."""
+    numeric = _finite_float(value)
+    if numeric is None:
+        return "N/A"
     try:
-        if value is None:
-            return "N/A"
-        numeric = float(value)
-        format_str = f"{{:,.{decimals}f}}"
-        return f"${format_str.format(numeric)}"
-    except Exception:
+        return _fmt_money_cached(numeric, decimals)
+    except (TypeError, ValueError):
         return "N/A"
 
 
+@lru_cache(maxsize=4096)
+def _fmt_money_cached(numeric: float, decimals: int) -> str:
+    return "$" + format(numeric, _DECIMAL_SPECS.get(decimals) or f",.{decimals}f")
+
+
 def _fmt_num(value: Any, decimals: Optional[int] = None) -> str:
     """Format numeric value with commas; return 'N/A' if not numeric."""
+    numeric = _finite_float(value)
+    if numeric is None:
+        return "N/A"
     try:
-        if value is None:
-            return "N/A"
-        numeric = float(value)
-        if decimals is None:
-            return f"{int(round(numeric)):,}"
-        return f"{numeric:,.{decimals}f}"
-    except Exception:
+        return _fmt_num_cached(numeric, decimals)
+    except (TypeError, ValueError):
         return "N/A"
 
 
+@lru_cache(maxsize=4096)
+def _fmt_num_cached(numeric: float, decimals: Optional[int]) -> str:
+    if decimals is None:
+        return f"{int(round(numeric)):,}"
+    return format(numeric, _DECIMAL_SPECS.get(decimals) or f",.{decimals}f")
+
+
 def _fmt_pct(value: Any) -> str:
     """Format percentage with sign; return 'N/A' if not numeric."""
-    try:
-        if value is None:
-            return "N/A"
-        numeric = float(value)
-        return f"{numeric:+.2f}%"
-    except Exception:
+    numeric = _finite_float(value)
+    if numeric is None:
         return "N/A"
+    return _fmt_pct_cached(numeric)
+
+
+@lru_cache(maxsize=4096)
+def _fmt_pct_cached(numeric: float) -> str:
+    return f"{numeric:+.2f}%"
 
 
 async def get_dex_pairs(chain="ethereum", filters=None, sort_by=None, limit=100):
@@ -418,11 +644,9 @@ async def get_dex_pairs(chain="ethereum", filters=None, sort_by=None, limit=100)
         params["sort_by"] = sort_by
     
     try:
-        response = await safe_http_request('GET', url, headers=headers, params=params)
+        response, data = await safe_http_json('GET', url, headers=headers, params=params)
         response.raise_for_status()
         
-        data = response.json()
-        
         # Fix: Access data through result['rows'] based on debugging findings
         if isinstance(data, dict) and 'result' in data:
             result = data.get('result', {})
@@ -483,79 +707,245 @@ async def execute_dune_query(sql_query: str, parameters: Dict[str, Any] = None):
         logger.error(f"Error executing Dune query: {e}")
         return None
 
-# HTTP client initialization
-async def init_http_client():
-    """Initialize HTTP client bound to the current running event loop."""
-    global http_client, _http_client_loop_id
+class AsyncTokenBucket:
+    """Client-side token bucket that delays sends instead of drawing 429s.
+    
+    Tokens are reserved before sleeping, so concurrent callers queue up by
+    going into debt rather than contending on a lock; the bucket carries no
+    loop-bound state and can be shared across event loops.
+    """
+
+    __slots__ = ("capacity", "refill_rate", "tokens", "last_refill")
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+
+    async def acquire(self, cost: float = 1.0):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+        self.tokens -= cost
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.refill_rate)
+
+    def penalize(self):
+        """Drain the bucket after the server answered 429."""
+        self.tokens = min(self.tokens, -1.0)
+
+# Per-host budgets: CoinMarketCap's basic plan allows 30 calls/minute;
+# api.llama.fi tolerates short bursts at a few requests per second
+_RATE_LIMITS: Mapping[str, AsyncTokenBucket] = MappingProxyType({
+    "pro-api.coinmarketcap.com": AsyncTokenBucket(30, 30 / 60),
+    "api.llama.fi": AsyncTokenBucket(300, 5.0),
+})
+_RATE_LIMIT_RETRIES = 3
+
+def _retry_after(response: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying a 429, capped so a chat turn never stalls long."""
+    try:
+        delay = float(response.headers.get("Retry-After", ""))
+    except ValueError:
+        delay = 0.5 * 2 ** attempt
+    return min(max(delay, 0.0), 10.0)
+
+async def _throttled_send(client: httpx.AsyncClient, request: httpx.Request, stream: bool = False) -> httpx.Response:
+    """Send through the host's token bucket, retrying 429 responses with backoff."""
+    bucket = _RATE_LIMITS.get(request.url.host)
+    for attempt in range(_RATE_LIMIT_RETRIES + 1):
+        if bucket is not None:
+            await bucket.acquire()
+        response = await client.send(request, stream=stream)
+        if response.status_code != 429 or attempt == _RATE_LIMIT_RETRIES:
+            return response
+        await response.aclose()
+        if bucket is not None:
+            bucket.penalize()
+        await asyncio.sleep(_retry_after(response, attempt))
+    return response
+
+# Upper bound on a buffered response body (decoded bytes); a larger body is
+# abandoned mid-stream instead of being held in memory in full
+_MAX_BODY_BYTES = int(os.getenv("MAX_RESPONSE_BYTES", str(32 * 1024 * 1024)))
+# Headers describing the wire encoding, which no longer apply once decoded
+_WIRE_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+async def _read_bounded(response: httpx.Response, limit: int) -> httpx.Response:
+    """Buffer a streamed response, giving up once its body passes ``limit`` bytes."""
+    chunks = []
     try:
-        current_loop = asyncio.get_running_loop()
-    except RuntimeError:
-        # Fallback: create a new loop if none is running (rare for async context)
-        current_loop = asyncio.get_event_loop()
+        declared = response.headers.get("Content-Length", "")
+        size = int(declared) if declared.isdigit() else 0
+        if size <= limit:
+            size = 0
+            async for chunk in response.aiter_bytes():
+                size += len(chunk)
+                if size > limit:
+                    break
+                chunks.append(chunk)
+        if size > limit:
+            raise ValueError(f"Response from {response.request.url.host} exceeds {limit} bytes")
+    finally:
+        await response.aclose()
+    return httpx.Response(
+        response.status_code,
+        headers=[(k, v) for k, v in response.headers.multi_items() if k.lower() not in _WIRE_HEADERS],
+        content=b"".join(chunks),
+        request=response.request,
+        extensions=response.extensions,
+    )
+
+# HTTP client initialization
+def _new_http_client() -> httpx.AsyncClient:
+    # HTTP/2 multiplexes Dune polling and API fan-out over a few warm TLS
+    # connections; transport retries cover transient connect failures.
+    # Pool limits live on the transport since httpx ignores client-level
+    # limits once a custom transport is supplied. Per-request headers (API
+    # keys) merge over the client-wide User-Agent
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=5.0),
+        headers={"User-Agent": "airaaagent/1.0"},
+        transport=httpx.AsyncHTTPTransport(
+            http2=True,
+            retries=2,
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=30.0),
+        ),
+    )
+
+# Per-request budget for warm-up HEADs, so one unresponsive upstream cannot
+# stall startup for the client's full 30 s read timeout
+_WARMUP_TIMEOUT = httpx.Timeout(2.5)
+
+async def init_http_client(warm: bool = False):
+    """Initialize HTTP client bound to the current running event loop.
+    
+    With ``warm=True``, also pre-connect to the upstream APIs (see
+    warm_http_client) before returning.
+    """
+    await get_http_client()
+    if warm:
+        await warm_http_client()
 
-    # Close existing client if it's bound to a different loop
-    if http_client is not None and not http_client.is_closed and _http_client_loop_id is not None and _http_client_loop_id != id(current_loop):
+async def warm_http_client():
+    """Open a keep-alive connection to each upstream API host.
+    
+    Lets the first user request skip the TCP+TLS handshakes. Each HEAD is
+    capped at ``_WARMUP_TIMEOUT``; failures are logged and otherwise ignored.
+    """
+    client = await get_http_client()
+    # The DefiLlama aggregate fans out across all four llama.fi API hosts
+    hosts = (
+        "dune", "etherscan", "coinmarketcap",
+        "defillama", "defillama_stablecoins", "defillama_yields", "defillama_bridges",
+    )
+    results = await asyncio.gather(
+        *(client.head(MCPConfig.BASE_URLS[host], timeout=_WARMUP_TIMEOUT) for host in hosts),
+        return_exceptions=True
+    )
+    for host, result in zip(hosts, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not pre-connect to {host}: {result}")
+
+async def close_http_client():
+    """Close the current event loop's HTTP client, if one is open."""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
         try:
-            await http_client.aclose()
+            await client.aclose()
         except Exception:
             pass
-        http_client = None
 
-    if http_client is None or http_client.is_closed:
-        http_client = httpx.AsyncClient(
-            timeout=httpx.Timeout(60.0),
-            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
-        )
-        _http_client_loop_id = id(current_loop)
+async def get_http_client() -> httpx.AsyncClient:
+    """Get or lazily create the HTTP client for the current event loop."""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _new_http_client()
+        _http_clients[loop] = client
+    return client
 
-async def get_http_client():
-    """Get or create HTTP client ensuring it's usable in the current event loop."""
-    global http_client, _http_client_loop_id
+async def safe_http_request(method: str, url: str, **kwargs):
+    """Make a safe HTTP request with proper client handling
+    
+    Connect retries happen in the client transport; rate-limited hosts are
+    throttled client-side and 429s are retried with backoff. Bodies larger
+    than ``_MAX_BODY_BYTES`` raise ValueError rather than being buffered.
+    """
+    method = method.upper()
+    if method not in ('GET', 'POST'):
+        raise ValueError(f"Unsupported HTTP method: {method}")
     try:
-        current_loop = asyncio.get_running_loop()
-    except RuntimeError:
-        current_loop = asyncio.get_event_loop()
-
-    # Recreate client if none, closed, or created under a different loop
-    if (
-        http_client is None
-        or http_client.is_closed
-        or _http_client_loop_id is None
-        or _http_client_loop_id != id(current_loop)
-    ):
-        await init_http_client()
-    return http_client
+        client = await get_http_client()
+        response = await _throttled_send(client, client.build_request(method, url, **kwargs), stream=True)
+        return await _read_bounded(response, _MAX_BODY_BYTES)
+    except Exception as e:
+        logger.error(f"HTTP request failed: {e}")
+        raise
 
-async def safe_http_request(method: str, url: str, **kwargs):
-    """Make a safe HTTP request with proper client handling"""
-    max_retries = 2
-    for attempt in range(max_retries):
-        try:
-            client = await get_http_client()
-            if method.upper() == 'GET':
-                return await client.get(url, **kwargs)
-            elif method.upper() == 'POST':
-                return await client.post(url, **kwargs)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
-        except Exception as e:
-            logger.error(f"HTTP request failed (attempt {attempt + 1}): {e}")
-            # If client is closed or we're on the first attempt, try to recreate it
-            global http_client, _http_client_loop_id
-            if http_client and (http_client.is_closed or "Event loop is closed" in str(e)):
-                try:
-                    await http_client.aclose()
-                except:
-                    pass  # Ignore errors when closing
-                http_client = None
-                _http_client_loop_id = None
-                await init_http_client()
-            
-            if attempt == max_retries - 1:
-                raise
-            
-            # Small delay before retry
-            await asyncio.sleep(0.1)
+# Recent successful GET responses for safe_http_request_cached:
+# (url, params, headers) -> (status, response headers, body)
+_http_response_cache = _TTLCache(maxsize=512)
+
+async def safe_http_request_cached(method: str, url: str, cache_ttl: float = 0, **kwargs):
+    """safe_http_request that reuses a successful GET response for ``cache_ttl`` seconds.
+    
+    Meant for slow-moving aggregates; a zero TTL or a non-GET method always hits
+    the network.
+    """
+    if cache_ttl <= 0 or method.upper() != 'GET':
+        return await safe_http_request(method, url, **kwargs)
+    params = kwargs.get("params")
+    headers = kwargs.get("headers")
+    key = (
+        url,
+        tuple(sorted(params.items())) if params else (),
+        tuple(sorted(headers.items())) if headers else (),
+    )
+    cached = _http_response_cache.get(key)
+    if cached is not None:
+        status, response_headers, content = cached
+        return httpx.Response(
+            status, headers=response_headers, content=content, request=httpx.Request('GET', url, params=params)
+        )
+    response = await safe_http_request(method, url, **kwargs)
+    if response.is_success:
+        _http_response_cache.set(key, (response.status_code, response.headers.multi_items(), response.content), cache_ttl)
+    return response
+
+async def safe_http_json(method: str, url: str, **kwargs):
+    """Make a safe HTTP request and parse a successful JSON body.
+    
+    The body is read under the same ``_MAX_BODY_BYTES`` cap as
+    safe_http_request and parsed with orjson. Returns ``(response, data)``
+    where ``data`` is None unless the response status is 2xx.
+    """
+    try:
+        client = await get_http_client()
+        return await _send_json(client, client.build_request(method.upper(), url, **kwargs))
+    except Exception as e:
+        logger.error(f"HTTP request failed: {e}")
+        raise
+
+async def _send_json(client: httpx.AsyncClient, request: httpx.Request):
+    """Send a prebuilt request; see safe_http_json for the return value."""
+    response = await _throttled_send(client, request, stream=True)
+    response = await _read_bounded(response, _MAX_BODY_BYTES)
+    if not response.is_success:
+        return response, None
+    return response, _fast_json(response)
+
+def _fast_json(resp: httpx.Response) -> Any:
+    """Parse a buffered response body with orjson, straight from its bytes.
+    
+    Bodies orjson rejects (e.g. NaN/Infinity literals) go through the stdlib
+    parser, which accepts them.
+    """
+    try:
+        return orjson.loads(resp.content)
+    except orjson.JSONDecodeError:
+        return json.loads(resp.content)
 
 # Optimized MCP Tools using modern LangChain decorators
 # =============================
@@ -580,7 +970,120 @@ class MCPConfig:
         # "nansen": "https://api.nansen.ai/v1"
     }
 
+# Keyword vocabulary for routing dune_analytics_tool queries, by category
+_DUNE_KEYWORD_CATEGORIES: Dict[str, tuple] = {
+    "dex": ("dex", "pairs", "trading", "ethereum", "swap"),
+    "advanced_volume": ("volume analysis", "top volume", "trading volume by pair", "dex volume"),
+    "address": ("address", "wallet", "specific", "particular"),
+    "btc": ("bitcoin", "btc", "analysis", "investment", "performance"),
+    "volume": ("volume",),
+    "whale": ("whale",),
+    "gas": ("gas",),
+    "nft": ("nft",),
+    "defi": ("defi",),
+}
+
+# Saved Dune query per topic; the first matching topic wins
+_DUNE_QUERY_IDS: Dict[str, int] = {
+    "volume": 1234567,
+    "whale": 1234571,
+    "gas": 1234572,
+    "nft": 1234570,
+    "defi": 1234569,
+}
+
+
+_DUNE_CLASSIFIER = _KeywordClassifier(_DUNE_KEYWORD_CATEGORIES)
+
+
+# Top pairs by USD volume; {{...}} are Dune query parameters, so the text
+# stays identical across calls and Dune can reuse the plan
+_DUNE_TOP_PAIRS_SQL = """
+SELECT 
+    CONCAT(
+        COALESCE(tb.symbol, 'Unknown'), 
+        '-', 
+        COALESCE(ts.symbol, 'Unknown')
+    ) AS pair,
+    SUM(amount_usd) AS volume
+FROM dex.trades dt
+LEFT JOIN tokens.erc20 tb ON dt.token_bought_address = tb.contract_address 
+    AND dt.blockchain = tb.blockchain
+LEFT JOIN tokens.erc20 ts ON dt.token_sold_address = ts.contract_address 
+    AND dt.blockchain = ts.blockchain
+WHERE dt.block_time >= NOW() - INTERVAL '{{interval_days}}' DAY
+    AND dt.blockchain = '{{blockchain}}'
+    AND dt.amount_usd > 0
+GROUP BY 1
+ORDER BY volume DESC
+LIMIT 10
+"""
+
+# Static Dune snapshot served when the execute endpoint is unavailable
+FALLBACK_DUNE_DATA: Mapping[str, Any] = MappingProxyType({
+    "dex_volume_24h": 2.5e9,
+    "total_transactions": 125000,
+    "unique_users": 45000,
+    "gas_usage": 15.2e6,
+    "top_tokens": ("USDC", "WETH", "USDT", "DAI"),
+    "chain": "ethereum",
+})
+
+# Dune execution polling cadence and overall budget, in seconds; the budget
+# stays inside run_tools_batch's per-tool timeout so Dune can still report
+# its own polling timeout
+_DUNE_POLL_INTERVAL = 0.5
+_DUNE_POLL_TIMEOUT = 12.0
+# Execution states that will never reach QUERY_STATE_COMPLETED
+_DUNE_FAILED_STATES = frozenset({"QUERY_STATE_FAILED", "QUERY_STATE_CANCELLED", "QUERY_STATE_EXPIRED"})
+# DEX pair rows kept in merged_data (and so in session history); totals still cover every row
+_DUNE_MAX_STORED_PAIRS = 50
+
+
+def _dune_error(response: httpx.Response) -> str:
+    """Dune's error message from a failed response, falling back to the raw body."""
+    try:
+        error = _fast_json(response).get("error")
+    except Exception:
+        error = None
+    if isinstance(error, dict):
+        error = error.get("message")
+    return str(error or response.text[:200] or "no details")
+
+
+async def _poll_until_ready(execution_id: str, headers: Dict[str, str]) -> Dict[str, Any]:
+    """Poll a Dune execution until it completes and return its results payload.
+    
+    Raises RuntimeError with Dune's message when the execution fails, is
+    cancelled or expires, or when the results endpoint returns a 4xx other
+    than 429; 5xx responses and 429s are polled through.
+    """
+    client = await get_http_client()
+    # Build the poll request once; every round re-sends the same URL and headers
+    request = client.build_request(
+        'GET',
+        f"{MCPConfig.BASE_URLS['dune']}/api/v1/execution/{execution_id}/results",
+        headers=headers
+    )
+    while True:
+        # Jitter keeps concurrent executions from polling in lockstep
+        await asyncio.sleep(_DUNE_POLL_INTERVAL * random.uniform(0.8, 1.2))
+        response, result_data = await _send_json(client, request)
+        if response.status_code == 200 and isinstance(result_data, dict):
+            state = result_data.get("state")
+            if state == "QUERY_STATE_COMPLETED":
+                return result_data
+            if state in _DUNE_FAILED_STATES:
+                error = result_data.get("error")
+                message = error.get("message") if isinstance(error, dict) else error
+                raise RuntimeError(f"Dune execution {state.rsplit('_', 1)[-1].lower()}: {message or 'no details'}")
+        elif 400 <= response.status_code < 500 and response.status_code != 429:
+            # Client errors (bad key, unknown execution) won't clear up by polling again
+            raise RuntimeError(f"Dune results request failed with HTTP {response.status_code}: {_dune_error(response)}")
+
+
 @tool
+@_single_flight
 async def dune_analytics_tool(query: str, address: str = None, time_range: str = "7d") -> Dict[str, Any]:
     """
     Execute blockchain analytics queries using Dune Analytics.
@@ -597,34 +1100,17 @@ async def dune_analytics_tool(query: str, address: str = None, time_range: str =
         return {"success": False, "error": "Dune API key not configured"}
     
     try:
+        categories = _DUNE_CLASSIFIER.classify(query)
+        
         # Check if this is a DEX pairs query
-        if any(keyword in query.lower() for keyword in ["dex", "pairs", "trading", "ethereum", "swap"]):
+        if "dex" in categories:
             # Check if this is an advanced volume analysis query
-            if any(advanced_keyword in query.lower() for advanced_keyword in ["volume analysis", "top volume", "trading volume by pair", "dex volume"]):
+            if "advanced_volume" in categories:
                 # Use custom SQL query for advanced volume analysis
-                sql_query = """
-                SELECT 
-                    CONCAT(
-                        COALESCE(tb.symbol, 'Unknown'), 
-                        '-', 
-                        COALESCE(ts.symbol, 'Unknown')
-                    ) AS pair,
-                    SUM(amount_usd) AS volume
-                FROM dex.trades dt
-                LEFT JOIN tokens.erc20 tb ON dt.token_bought_address = tb.contract_address 
-                    AND dt.blockchain = tb.blockchain
-                LEFT JOIN tokens.erc20 ts ON dt.token_sold_address = ts.contract_address 
-                    AND dt.blockchain = ts.blockchain
-                WHERE dt.block_time >= NOW() - INTERVAL '7' DAY
-                    AND dt.blockchain = 'ethereum'
-                    AND dt.amount_usd > 0
-                GROUP BY 1
-                ORDER BY volume DESC
-                LIMIT 10
-                """
+                sql_query = _DUNE_TOP_PAIRS_SQL
                 
                 # Execute the custom SQL query
-                sql_result = await execute_dune_query(sql_query, {})
+                sql_result = await execute_dune_query(sql_query, {"interval_days": 7, "blockchain": "ethereum"})
                 
                 if sql_result and sql_result.get("success"):
                     return {
@@ -643,7 +1129,7 @@ async def dune_analytics_tool(query: str, address: str = None, time_range: str =
             
             # Build filters based on address if provided - but only for specific address analysis
             filters = None
-            if address and any(keyword in query.lower() for keyword in ["address", "wallet", "specific", "particular"]):
+            if address and "address" in categories:
                 # Only apply address filter for specific address analysis queries
                 filters = f"token_a_address = '{address}' OR token_b_address = '{address}'"
             
@@ -674,49 +1160,13 @@ async def dune_analytics_tool(query: str, address: str = None, time_range: str =
                 return {"success": False, "error": "Dune DEX API returned no data"}
         
         # Enhanced general analytics for Bitcoin/crypto analysis
-        elif any(keyword in query.lower() for keyword in ["bitcoin", "btc", "analysis", "investment", "performance"]):
-            # Provide comprehensive Bitcoin analytics data
-            mock_bitcoin_analytics = [
-                {
-                    "metric": "network_activity",
-                    "active_addresses_7d": 985000,
-                    "transaction_count_7d": 2100000,
-                    "avg_transaction_value": 15750.50,
-                    "hash_rate_exahash": 450.2,
-                    "difficulty": 55620000000000,
-                    "mempool_size": 125000
-                },
-                {
-                    "metric": "market_indicators",
-                    "fear_greed_index": 72,
-                    "social_sentiment": "bullish",
-                    "whale_activity": "high",
-                    "exchange_inflows_7d": 85000000,
-                    "exchange_outflows_7d": 125000000,
-                    "net_flow": 40000000
-                },
-                {
-                    "metric": "defi_integration",
-                    "wrapped_btc_supply": 285000,
-                    "lightning_network_capacity": 5200,
-                    "institutional_holdings": 1250000,
-                    "etf_holdings": 875000
-                }
-            ]
-            
+        elif "btc" in categories:
+            # No Bitcoin analytics source is wired up yet
             return {"success": False, "error": "No analytics available"}
         else:
             # Original Dune Analytics query execution logic
-            query_patterns = {
-                "volume": 1234567,
-                "whale": 1234571,
-                "gas": 1234572,
-                "nft": 1234570,
-                "defi": 1234569
-            }
-            
-            query_id = next((qid for pattern, qid in query_patterns.items() 
-                            if pattern in query.lower()), 1234567)
+            query_id = next((qid for pattern, qid in _DUNE_QUERY_IDS.items() 
+                            if pattern in categories), 1234567)
             
             params = {"time_range": time_range}
             if address:
@@ -724,24 +1174,16 @@ async def dune_analytics_tool(query: str, address: str = None, time_range: str =
             
             headers = {"X-Dune-API-Key": DUNE_API_KEY}
             
-            # Execute query
+            # Execute query; encode the body once with orjson rather than httpx's stdlib json
             response = await safe_http_request(
                 'POST',
                 f"{MCPConfig.BASE_URLS['dune']}/api/v1/query/{query_id}/execute",
-                headers=headers,
-                json={"query_parameters": params}
+                headers={**headers, "Content-Type": "application/json"},
+                content=orjson.dumps({"query_parameters": params})
             )
             if response.status_code != 200:
                 # Provide fallback data when Dune API is not available
-                fallback_data = {
-                    "dex_volume_24h": 2.5e9,
-                    "total_transactions": 125000,
-                    "unique_users": 45000,
-                    "gas_usage": 15.2e6,
-                    "top_tokens": ["USDC", "WETH", "USDT", "DAI"],
-                    "chain": "ethereum",
-                    "timestamp": datetime.now().isoformat()
-                }
+                fallback_data = {**FALLBACK_DUNE_DATA, "timestamp": _iso_now()}
                 return {
                     "success": True, 
                     "data": fallback_data, 
@@ -749,37 +1191,60 @@ async def dune_analytics_tool(query: str, address: str = None, time_range: str =
                     "note": "Using fallback data due to API limitations"
                 }
             
-            exec_data = response.json()
+            exec_data = orjson.loads(response.content)
             execution_id = exec_data.get("execution_id")
             
-            # Poll for results with exponential backoff
-            for attempt in range(5):  # Reduced attempts for demo
-                await asyncio.sleep(min(2 ** attempt, 5))  # Reduced wait time
-                
-                response = await safe_http_request(
-                    'GET',
-                    f"{MCPConfig.BASE_URLS['dune']}/api/v1/execution/{execution_id}/results",
-                    headers=headers
+            # Poll for results until ready, bounded by an overall deadline
+            try:
+                result_data = await asyncio.wait_for(
+                    _poll_until_ready(execution_id, headers),
+                    timeout=_DUNE_POLL_TIMEOUT
                 )
-                if response.status_code == 200:
-                    result_data = response.json()
-                    if result_data.get("state") == "QUERY_STATE_COMPLETED":
-                        return {
-                            "success": True,
-                            "data": result_data.get("result", {}).get("rows", []),
-                            "metadata": result_data.get("result", {}).get("metadata", {}),
-                            "source": "dune_analytics"
-                        }
+            except asyncio.TimeoutError:
+                # If polling fails, return failure
+                logger.warning("Dune query polling timeout")
+                return {"success": False, "error": "Dune query polling timeout"}
             
-            # If polling fails, return failure
-            logger.warning("Dune query polling timeout")
-            return {"success": False, "error": "Dune query polling timeout"}
+            return {
+                "success": True,
+                "data": result_data.get("result", {}).get("rows", []),
+                "metadata": result_data.get("result", {}).get("metadata", {}),
+                "source": "dune_analytics"
+            }
         
     except Exception as e:
         logger.error(f"Dune Analytics error: {e}")
         return {"success": False, "error": str(e)}
 
+# Mock Ethereum network health metrics attached to network analysis queries
+NETWORK_METRICS_TEMPLATE: Mapping[str, Any] = MappingProxyType({
+    "avg_block_time": 12.05,
+    "pending_transactions": 125000,
+    "gas_price_gwei": 25.5,
+    "network_utilization": 0.78,
+    "active_addresses_24h": 485000,
+    "transaction_throughput_tps": 15.2,
+    "validator_count": 520000,
+    "staking_ratio": 0.22,
+})
+
+# Ethereum Foundation address used as a sample when a query names no wallet
+_SAMPLE_ETH_ADDRESS = "0xde0B295669a9FD93d5F28D9Ec85E40f4cb697BAe"
+
+# Wei per ether, as an int for float balances and a Decimal for exact ones
+_WEI_PER_ETH = 10**18
+_WEI_PER_ETH_DEC = Decimal(_WEI_PER_ETH)
+
+# Keyword vocabulary for routing etherscan_tool queries, by category
+_ETHERSCAN_CLASSIFIER = _KeywordClassifier({
+    "sample_address": ("network", "analysis", "health", "activity"),
+    "network_report": ("network", "analysis", "health"),
+    "balance": ("balance",),
+    "token": ("token",),
+})
+
 @tool
+@_single_flight
 async def etherscan_tool(query: str, address: str = None) -> Dict[str, Any]:
     """
     Get Ethereum blockchain data via Etherscan API.
@@ -794,18 +1259,20 @@ async def etherscan_tool(query: str, address: str = None) -> Dict[str, Any]:
     if not ETHERSCAN_API_KEY:
         return {"success": False, "error": "Etherscan API key not configured"}
     
+    categories = _ETHERSCAN_CLASSIFIER.classify(query)
+    
     # If no address provided but query suggests network analysis, use sample address
-    if not address and any(keyword in query.lower() for keyword in ["network", "analysis", "health", "activity"]):
-        address = "0xde0B295669a9FD93d5F28D9Ec85E40f4cb697BAe"  # Ethereum Foundation
+    if not address and "sample_address" in categories:
+        address = _SAMPLE_ETH_ADDRESS
     
     if not address:
         return {"success": False, "error": "Etherscan requires wallet address for analysis"}
     
     try:
         # Enhanced parameter mapping for comprehensive analysis
-        if "balance" in query.lower():
+        if "balance" in categories:
             params = {"module": "account", "action": "balance", "address": address}
-        elif "token" in query.lower():
+        elif "token" in categories:
             params = {"module": "account", "action": "tokentx", "address": address, "page": 1, "offset": 100}
         else:
             # Default to transaction analysis for comprehensive data
@@ -815,24 +1282,15 @@ async def etherscan_tool(query: str, address: str = None) -> Dict[str, Any]:
         
         response = await safe_http_request('GET', MCPConfig.BASE_URLS["etherscan"], params=params)
         if response.status_code == 200:
-            data = response.json()
+            data = _fast_json(response)
             
             # Enhance data with mock network health metrics for comprehensive analysis
-            if "network" in query.lower() or "analysis" in query.lower() or "health" in query.lower():
+            if "network_report" in categories:
                 enhanced_data = {
                     "etherscan_data": data,
-                    "network_metrics": {
-                        "avg_block_time": 12.05,
-                        "pending_transactions": 125000,
-                        "gas_price_gwei": 25.5,
-                        "network_utilization": 0.78,
-                        "active_addresses_24h": 485000,
-                        "transaction_throughput_tps": 15.2,
-                        "validator_count": 520000,
-                        "staking_ratio": 0.22
-                    },
+                    "network_metrics": dict(NETWORK_METRICS_TEMPLATE),
                     "analysis_context": {
-                        "address_type": "ethereum_foundation" if address == "0xde0B295669a9FD93d5F28D9Ec85E40f4cb697BAe" else "user_address",
+                        "address_type": "ethereum_foundation" if address == _SAMPLE_ETH_ADDRESS else "user_address",
                         "data_purpose": "network_health_analysis"
                     }
                 }
@@ -849,568 +1307,698 @@ async def etherscan_tool(query: str, address: str = None) -> Dict[str, Any]:
 # =============================
 # Tools: DefiLlama
 # =============================
-@tool
-async def defillama_tool(query: str) -> Dict[str, Any]:
-    """
-    Get DeFi ecosystem data from DefiLlama using multiple routes.
+_DEFILLAMA_URL = MCPConfig.BASE_URLS["defillama"]
+_DEFILLAMA_COINS_URL = MCPConfig.BASE_URLS["defillama_coins"]
+_DEFILLAMA_YIELDS_URL = MCPConfig.BASE_URLS["defillama_yields"]
+_DEFILLAMA_STABLECOINS_URL = MCPConfig.BASE_URLS["defillama_stablecoins"]
+_DEFILLAMA_BRIDGES_URL = MCPConfig.BASE_URLS["defillama_bridges"]
+
+# Aggregate sections in response order, and the query keywords that name each
+_DEFILLAMA_SECTIONS = ("tvl", "stablecoins", "dex", "fees", "yields", "bridges")
+_DEFILLAMA_SECTION_KEYWORDS: Dict[str, str] = {
+    "tvl": "tvl",
+    "stablecoin": "stablecoins", "stablecoins": "stablecoins",
+    "dex": "dex",
+    "fees": "fees", "revenue": "fees",
+    "yield": "yields", "yields": "yields", "apy": "yields",
+    "bridge": "bridges", "bridges": "bridges",
+}
 
-    Supports: prices, TVL (protocol/chain), stablecoins, yields/APY, DEX volumes, fees/revenue, bridges.
+# Per-section deadline for the aggregate fan-out, in seconds
+_DEFILLAMA_SECTION_TIMEOUT = 5.0
+
+# Overview endpoints return full daily charts unless told not to
+_DEFILLAMA_EXCLUDE_CHARTS: Mapping[str, str] = MappingProxyType({
+    "excludeTotalDataChart": "true",
+    "excludeTotalDataChartBreakdown": "true",
+})
+
+# Protocol slugs recognized in free text; the first match wins
+_DEFILLAMA_KNOWN_PROTOCOLS = ("aave", "curve", "uniswap", "makerdao", "compound", "rocket-pool", "lido")
+
+# Endpoint names that exist only on the Pro API (no key configured here), as
+# word sequences; each matches as adjacent words of the query ("active users")
+# or run together as one word or path segment ("/activeusers")
+_DEFILLAMA_PRO_ENDPOINT_WORDS: Tuple[Tuple[str, ...], ...] = (
+    ("token", "protocols"), ("inflows",), ("chain", "assets"), ("active", "users"), ("user", "data"),
+    ("emissions",), ("emission",), ("categories",), ("forks",), ("oracles",), ("hacks",), ("raises",),
+    ("treasuries",), ("entities",), ("historical", "liquidity"), ("pools", "borrow"),
+    ("chart", "lend", "borrow"), ("perps",), ("lsd", "rates"), ("etfs",), ("fdv",), ("derivatives",),
+)
+_DEFILLAMA_PRO_MARKERS = frozenset(
+    marker for words in _DEFILLAMA_PRO_ENDPOINT_WORDS for marker in (words, ("".join(words),))
+)
+_DEFILLAMA_PRO_MARKER_LEN = max(len(words) for words in _DEFILLAMA_PRO_ENDPOINT_WORDS)
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _names_pro_endpoint(q: str) -> bool:
+    """Whether the lowered query names a Pro-only DefiLlama endpoint"""
+    words = _WORD_RE.findall(q)
+    return any(
+        tuple(words[i:i + n]) in _DEFILLAMA_PRO_MARKERS
+        for n in range(1, _DEFILLAMA_PRO_MARKER_LEN + 1)
+        for i in range(len(words) - n + 1)
+    )
+
+# Keyword triggers for routing defillama_tool queries; matched as substrings
+_DEFILLAMA_AGGREGATE_TRIGGERS = frozenset({"all", "overview", "defi", "tvl", "stablecoin", "stablecoins", "dex", "fees", "revenue", "yield", "yields", "apy", "bridge", "bridges"})
+_DEFILLAMA_AGGREGATE_EXCLUDES = frozenset({"price", "protocol", "historical", "chain tvl", "chart", "charts"})
+_DEFILLAMA_PRICE_TRIGGERS = frozenset({"price", "prices", "quote"})
+_DEFILLAMA_PROTOCOL_TRIGGERS = frozenset({"tvl", "protocol", "defi"})
+_DEFILLAMA_YIELD_TRIGGERS = frozenset({"yield", "yields", "apy", "lending", "borrow"})
+# Each keyword is its own category, so classify() returns the keywords found in the query
+_DEFILLAMA_CLASSIFIER = _KeywordClassifier({
+    keyword: (keyword,)
+    for keyword in sorted(
+        _DEFILLAMA_AGGREGATE_TRIGGERS | _DEFILLAMA_AGGREGATE_EXCLUDES | _DEFILLAMA_PRICE_TRIGGERS
+        | _DEFILLAMA_PROTOCOL_TRIGGERS | _DEFILLAMA_YIELD_TRIGGERS | {
+            "/bridge/", "/chart/", "/prices/first", "/prices/historical", "/stablecoin/", "/transactions/",
+            "asset", "batch", "block", "bridgedaystats", "chain", "chains", "coin", "coins", "first price", "id",
+            "options", "percentage", "pool", "raw", "stablecoinchains", "stablecoinprices", "summary",
+            "timestamp", "transactions", "volume",
+        }
+    )
+})
+
+# Field names seen across DefiLlama payload versions, in order of preference
+_CHAIN_NAME_KEYS = ("name", "chain", "gecko_id")
+_TVL_KEYS = ("tvl", "TVL", "tvlUsd", "tvl_usd")
+_SYMBOL_KEYS = ("symbol", "ticker")
+_CIRCULATING_KEYS = ("circulatingUSD", "market_cap_usd")
+_APY_KEYS = ("apy", "apyBase", "apy_base")
+
+# Patterns for pulling endpoint arguments out of lowercased queries
+_TIMESTAMP_RE = re.compile(r"\b(\d{10})\b")
+_HISTORICAL_TS_RE = re.compile(r"(19|20|21|22|23|24)?\b(\d{10})\b")
+_PERIOD_RE = re.compile(r"(\b\d+[wdhm]\b)")
+_POOL_ID_RE = re.compile(r"pool\s*[:=\s]([0-9a-f\-]{8,})")
+_PROTOCOL_SLUG_RE = re.compile(r"protocol\s*[:=]\s*([a-z0-9\-]+)")
+_BRIDGE_ID_RE = re.compile(r"id\s*[:=]\s*(\d+)")
+_ASSET_SLUG_RE = re.compile(r"asset\s*[:=]\s*([a-z0-9\-]+)")
+# Optional /transactions/{id} filters, in query-parameter order
+_TX_FILTER_RES: Dict[str, "re.Pattern[str]"] = {
+    key: re.compile(rf"{key}\s*[:=]\s*([^\s]+)")
+    for key in ("starttimestamp", "endtimestamp", "sourcechain", "address", "limit")
+}
 
-    Args:
-        query: Natural language query indicating the desired DefiLlama data.
+# DefiLlama snapshots move on the order of minutes, so successful results are
+# reused for a short TTL. Keys derive from user queries (asset and chain
+# combinations), so the cache is bounded and evicts least recently used
+_defillama_cache = _TTLCache(maxsize=256)
+# Per-loop, per-key locks so concurrent misses share one upstream fetch
+_defillama_locks: _KeyedLocks = weakref.WeakKeyDictionary()
+
+async def _defillama_cached(key: str, ttl: float, fetch) -> Dict[str, Any]:
+    """Return a fresh cached result for ``key``, or await ``fetch()`` and cache it on success."""
+    result = _defillama_cache.get(key)
+    if result is not None:
+        return dict(result)
+    async with _keyed_lock(_defillama_locks, key):
+        # Another task may have filled the entry while we waited
+        result = _defillama_cache.get(key)
+        if result is not None:
+            return dict(result)
+        result = await fetch()
+        if result.get("success"):
+            _defillama_cache.set(key, result, ttl)
+        return dict(result)
+
+# Cap on in-flight aggregate requests per loop, so concurrent sessions
+# fanning out at once cannot flood DefiLlama
+_DEFILLAMA_MAX_CONCURRENCY = 8
+_defillama_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+async def _defillama_get(url: str, **kwargs) -> httpx.Response:
+    """GET through the running loop's DefiLlama concurrency limit."""
+    loop = asyncio.get_running_loop()
+    semaphore = _defillama_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _defillama_semaphores[loop] = asyncio.Semaphore(_DEFILLAMA_MAX_CONCURRENCY)
+    async with semaphore:
+        return await safe_http_request('GET', url, **kwargs)
+
+async def _within_deadline(awaitable, timeout: float):
+    """Await with a deadline, returning None on timeout or any error."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except Exception:
+        return None
 
-    Returns:
-        Dictionary with data, metadata, and source identifiers.
+def _defillama_result(resp: httpx.Response, endpoint: str, **metadata: Any) -> Dict[str, Any]:
+    """Tool result for a single-endpoint response: parsed data on any 2xx, else the HTTP status."""
+    if resp.is_success:
+        return {
+            "success": True,
+            "data": _fast_json(resp),
+            "metadata": {"endpoint": endpoint, **metadata},
+            "source": "defillama"
+        }
+    return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
+
+async def _defillama_chains() -> Dict[str, Any]:
+    """Fetch the all-chains TVL snapshot."""
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/v2/chains")
+    return _defillama_result(resp, "/v2/chains")
+
+def _success_json(resp: Optional[httpx.Response]) -> Any:
+    """Parsed body of a 2xx response; None if the response is missing, failed or not JSON."""
+    if resp is None or not resp.is_success:
+        return None
+    try:
+        return _fast_json(resp)
+    except ValueError:
+        return None
+
+def _top_k(records: List[Any], k: int, score) -> List[Tuple[Any, Any]]:
+    """Top ``k`` records by ``score(record)``, highest first, as (score, record) pairs.
+    
+    A bounded min-heap of (score, -position, record) keeps only the survivors, so
+    no per-record output is built for the rest; the negated position keeps
+    earlier records ahead on equal scores, as a stable descending sort would.
+    Records that are not objects (score raises AttributeError) are skipped.
     """
+    heap: List[Tuple[Any, int, Any]] = []
+    for position, record in enumerate(records):
+        try:
+            value = score(record)
+        except AttributeError:
+            continue
+        if len(heap) < k:
+            heapq.heappush(heap, (value, -position, record))
+        elif heap[0][0] < value:
+            heapq.heapreplace(heap, (value, -position, record))
+    heap.sort(reverse=True)
+    return [(value, record) for value, _, record in heap]
+
+def _chain_tvl(item: Dict[str, Any]) -> float:
+    tvl_val = _first(item, _TVL_KEYS)
     try:
-        q = (query or "").lower()
+        return float(tvl_val) if tvl_val is not None else 0.0
+    except Exception:
+        return 0.0
 
-        # Aggregated DefiLlama data collection for TVL, stablecoins, DEX, fees, yields, bridges
-        if any(k in q for k in [
-            "all", "overview", "defi", "tvl", "stablecoin", "stablecoins", "dex", "fees", "revenue", "yield", "yields", "apy", "bridge", "bridges"
-        ]) and not any(k in q for k in ["price", "protocol", "historical", "chain tvl", "chart", "charts"]):
-            # Optional chain filter
-            chain_filter = extract_chain_from_text(q)
-            # Build requests using safe_http_request
-            client = await get_http_client()
-            chains_req = client.get(f"{MCPConfig.BASE_URLS['defillama']}/v2/chains")
-            stablecoins_req = client.get(f"{MCPConfig.BASE_URLS['defillama_stablecoins']}/stablecoins")
-            dex_params = {"excludeTotalDataChart": "true", "excludeTotalDataChartBreakdown": "true"}
-            fees_params = {"excludeTotalDataChart": "true", "excludeTotalDataChartBreakdown": "true"}
-            dex_req = client.get(
-                f"{MCPConfig.BASE_URLS['defillama']}/overview/dexs" + (f"/{chain_filter}" if chain_filter else ""),
-                params=dex_params
-            )
-            fees_req = client.get(
-                f"{MCPConfig.BASE_URLS['defillama']}/overview/fees" + (f"/{chain_filter}" if chain_filter else ""),
-                params=fees_params
-            )
-            yields_req = client.get(f"{MCPConfig.BASE_URLS['defillama_yields']}/pools")
-            bridges_req = client.get(f"{MCPConfig.BASE_URLS['defillama_bridges']}/bridges")
+def _stablecoin_circulating(asset: Dict[str, Any]) -> Any:
+    return _first(asset, _CIRCULATING_KEYS) or 0
 
-            responses = await asyncio.gather(
-                chains_req, stablecoins_req, dex_req, fees_req, yields_req, bridges_req,
-                return_exceptions=True
-            )
+def _pool_apy(pool: Dict[str, Any]) -> float:
+    apy = _first(pool, _APY_KEYS)
+    try:
+        return float(apy) if apy is not None else 0.0
+    except Exception:
+        return 0.0
+
+def _summarize_tvl(chains_data: Any) -> Dict[str, Any]:
+    if not isinstance(chains_data, list):
+        return {}
+    return {
+        "type": "tvl_overview",
+        "chains_count": len(chains_data),
+        "top_chains": [
+            {"name": _first(item, _CHAIN_NAME_KEYS, "Unknown"), "tvl_usd": tvl_usd}
+            for tvl_usd, item in _top_k(chains_data, 10, _chain_tvl)
+        ]
+    }
 
-            def safe_json(resp):
-                try:
-                    if hasattr(resp, "status_code") and 200 <= resp.status_code < 300:
-                        return resp.json()
-                except Exception:
-                    pass
-                return None
+def _summarize_stablecoins(stablecoins_data: Any) -> Dict[str, Any]:
+    if not isinstance(stablecoins_data, dict):
+        return {}
+    pegged_assets = stablecoins_data.get("peggedAssets") or stablecoins_data.get("assets") or []
+    if not isinstance(pegged_assets, list):
+        pegged_assets = []
+    return {
+        "type": "stablecoins_overview",
+        "assets_count": len(pegged_assets),
+        "top_assets": [
+            {
+                "name": asset.get("name"),
+                "symbol": _first(asset, _SYMBOL_KEYS),
+                "circulating_usd": _first(asset, _CIRCULATING_KEYS)
+            }
+            for _, asset in _top_k(pegged_assets, 10, _stablecoin_circulating)
+        ]
+    }
 
-            chains_data, stablecoins_data, dex_data, fees_data, yields_data, bridges_data = [
-                safe_json(r) if not isinstance(r, Exception) else None for r in responses
-            ]
+def _summarize_protocols(overview_data: Any, summary_type: str, chain_filter: Optional[str]) -> Dict[str, Any]:
+    """Summarize a DEX or fees /overview payload"""
+    if not isinstance(overview_data, dict):
+        return {}
+    protocols = overview_data.get("protocols") or overview_data.get("data") or []
+    if not isinstance(protocols, list):
+        protocols = []
+    return {
+        "type": summary_type,
+        "protocols_count": len(protocols),
+        "sample_protocols": protocols[:10],
+        "chain": chain_filter
+    }
 
-            # Summaries with strong guards
-            tvl_summary = {}
-            if isinstance(chains_data, list):
-                top_chains = []
-                for item in chains_data:
-                    if isinstance(item, dict):
-                        name = item.get("name") or item.get("chain") or item.get("gecko_id") or "Unknown"
-                        tvl_val = item.get("tvl") or item.get("TVL") or item.get("tvlUsd") or item.get("tvl_usd")
-                        try:
-                            tvl_num = float(tvl_val) if tvl_val is not None else 0.0
-                        except Exception:
-                            tvl_num = 0.0
-                        top_chains.append({"name": name, "tvl_usd": tvl_num})
-                top_chains.sort(key=lambda x: x.get("tvl_usd", 0), reverse=True)
-                tvl_summary = {
-                    "type": "tvl_overview",
-                    "chains_count": len(chains_data),
-                    "top_chains": top_chains[:10],
-                    "raw": chains_data
-                }
+def _summarize_yields(yields_data: Any) -> Dict[str, Any]:
+    # yields.llama.fi/pools wraps the pool list as {"status": ..., "data": [...]}
+    if isinstance(yields_data, dict):
+        yields_data = yields_data.get("data")
+    if not isinstance(yields_data, list):
+        return {}
+    return {
+        "type": "yields_overview",
+        "pools_count": len(yields_data),
+        "top_pools": [
+            {"project": p.get("project"), "chain": p.get("chain"), "symbol": p.get("symbol"), "apy": apy_val}
+            for apy_val, p in _top_k(yields_data, 10, _pool_apy)
+        ]
+    }
 
-            stablecoins_summary = {}
-            if isinstance(stablecoins_data, dict):
-                pegged_assets = stablecoins_data.get("peggedAssets") or stablecoins_data.get("assets") or []
-                assets_simple = []
-                for asset in pegged_assets if isinstance(pegged_assets, list) else []:
-                    if isinstance(asset, dict):
-                        assets_simple.append({
-                            "name": asset.get("name"),
-                            "symbol": asset.get("symbol") or asset.get("ticker"),
-                            "circulating_usd": asset.get("circulatingUSD") or asset.get("market_cap_usd")
-                        })
-                assets_simple.sort(key=lambda x: (x.get("circulating_usd") or 0), reverse=True)
-                stablecoins_summary = {
-                    "type": "stablecoins_overview",
-                    "assets_count": len(pegged_assets) if isinstance(pegged_assets, list) else 0,
-                    "top_assets": assets_simple[:10],
-                    "raw": stablecoins_data
-                }
+def _summarize_bridges(bridges_data: Any) -> Dict[str, Any]:
+    if not (isinstance(bridges_data, dict) and "bridges" in bridges_data):
+        return {}
+    bridges = bridges_data.get("bridges") or []
+    if not isinstance(bridges, list):
+        bridges = []
+    return {
+        "type": "bridges_overview",
+        "bridges_count": len(bridges),
+        "sample_bridges": bridges[:10]
+    }
 
-            dex_summary = {}
-            if isinstance(dex_data, dict):
-                protocols = dex_data.get("protocols") or dex_data.get("data") or []
-                dex_summary = {
-                    "type": "dex_overview",
-                    "protocols_count": len(protocols) if isinstance(protocols, list) else 0,
-                    "sample_protocols": protocols[:10] if isinstance(protocols, list) else [],
-                    "raw": dex_data,
-                    "chain": chain_filter
-                }
+def _aggregate_sections(kws: set) -> Tuple[str, ...]:
+    """Aggregate sections a query names, or all of them for broad queries."""
+    named = {_DEFILLAMA_SECTION_KEYWORDS[kw] for kw in kws & _DEFILLAMA_SECTION_KEYWORDS.keys()}
+    if "all" in kws or not named:
+        return _DEFILLAMA_SECTIONS
+    return tuple(section for section in _DEFILLAMA_SECTIONS if section in named)
+
+async def _defillama_aggregate(
+    chain_filter: Optional[str],
+    sections: Tuple[str, ...] = _DEFILLAMA_SECTIONS,
+    include_raw: bool = False,
+) -> Dict[str, Any]:
+    """Fetch and summarize the given aggregate sections in one fan-out.
+    
+    Sections are drawn from TVL, stablecoins, DEX, fees, yields and bridges.
+    Summaries carry only the top entries; the full upstream payloads (the yields
+    pool list alone runs to megabytes) are attached as ``raw`` only on request.
+    """
+    chain_suffix = f"/{chain_filter}" if chain_filter else ""
+    # Request factories, so unrequested sections never create a coroutine
+    requests = {
+        "tvl": lambda: _defillama_get(f"{_DEFILLAMA_URL}/v2/chains"),
+        "stablecoins": lambda: _defillama_get(f"{_DEFILLAMA_STABLECOINS_URL}/stablecoins"),
+        "dex": lambda: _defillama_get(f"{_DEFILLAMA_URL}/overview/dexs{chain_suffix}", params=_DEFILLAMA_EXCLUDE_CHARTS),
+        "fees": lambda: _defillama_get(f"{_DEFILLAMA_URL}/overview/fees{chain_suffix}", params=_DEFILLAMA_EXCLUDE_CHARTS),
+        "yields": lambda: _defillama_get(f"{_DEFILLAMA_YIELDS_URL}/pools"),
+        "bridges": lambda: _defillama_get(f"{_DEFILLAMA_BRIDGES_URL}/bridges"),
+    }
+    summarizers = {
+        "tvl": _summarize_tvl,
+        "stablecoins": _summarize_stablecoins,
+        "dex": lambda data: _summarize_protocols(data, "dex_overview", chain_filter),
+        "fees": lambda data: _summarize_protocols(data, "fees_overview", chain_filter),
+        "yields": _summarize_yields,
+        "bridges": _summarize_bridges,
+    }
 
-            fees_summary = {}
-            if isinstance(fees_data, dict):
-                protocols = fees_data.get("protocols") or fees_data.get("data") or []
-                fees_summary = {
-                    "type": "fees_overview",
-                    "protocols_count": len(protocols) if isinstance(protocols, list) else 0,
-                    "sample_protocols": protocols[:10] if isinstance(protocols, list) else [],
-                    "raw": fees_data,
-                    "chain": chain_filter
-                }
+    # Each section gets its own deadline (queueing for the limiter included),
+    # so one stalled endpoint drops out as None instead of holding the whole
+    # aggregate until the read timeout
+    responses = await asyncio.gather(*(
+        _within_deadline(requests[section](), _DEFILLAMA_SECTION_TIMEOUT) for section in sections
+    ))
+
+    aggregate: Dict[str, Any] = {"aggregate": True}
+    for section, resp in zip(sections, responses):
+        data = _success_json(resp)
+        # Summaries with strong guards
+        summary = summarizers[section](data)
+        if include_raw and summary:
+            summary["raw"] = data
+        aggregate[section] = summary
+
+    # Every section failing is an outage, not an empty market; report it as a
+    # failure so _defillama_cached doesn't serve it after DefiLlama recovers
+    if not any(aggregate[section] for section in sections):
+        return {
+            "success": False,
+            "error": "DefiLlama returned no data for any aggregate section",
+            "metadata": {"endpoint": "aggregate", "chain": chain_filter, "sections": list(sections)},
+            "source": "defillama"
+        }
 
-            yields_summary = {}
-            if isinstance(yields_data, list):
-                pools_simple = []
-                for p in yields_data:
-                    if isinstance(p, dict):
-                        apy = p.get("apy") or p.get("apyBase") or p.get("apy_base")
-                        try:
-                            apy_val = float(apy) if apy is not None else 0.0
-                        except Exception:
-                            apy_val = 0.0
-                        pools_simple.append({
-                            "project": p.get("project"),
-                            "chain": p.get("chain"),
-                            "symbol": p.get("symbol"),
-                            "apy": apy_val
-                        })
-                pools_simple.sort(key=lambda x: x.get("apy", 0), reverse=True)
-                yields_summary = {
-                    "type": "yields_overview",
-                    "pools_count": len(yields_data),
-                    "top_pools": pools_simple[:10],
-                    "raw": yields_data
-                }
+    return {
+        "success": True,
+        "data": aggregate,
+        "metadata": {"endpoint": "aggregate", "chain": chain_filter, "sections": list(sections)},
+        "source": "defillama"
+    }
 
-            bridges_summary = {}
-            if isinstance(bridges_data, dict) and "bridges" in bridges_data:
-                bridges = bridges_data.get("bridges") or []
-                bridges_summary = {
-                    "type": "bridges_overview",
-                    "bridges_count": len(bridges) if isinstance(bridges, list) else 0,
-                    "sample_bridges": bridges[:10] if isinstance(bridges, list) else [],
-                    "raw": bridges_data
-                }
+# defillama_tool routes. Each handler takes the lowered query, its keyword set,
+# the chain it names and the CoinGecko ids it mentions; returning None falls
+# through to the next matching route.
+async def _route_aggregate(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    # Fetch only the sections the query names; full upstream payloads
+    # only when it asks for raw data
+    sections = _aggregate_sections(kws)
+    include_raw = "raw" in kws
+    return await _defillama_cached(
+        f"aggregate:{chain_filter or '_all_'}:{','.join(sections)}:{int(include_raw)}", 60.0,
+        lambda: _defillama_aggregate(chain_filter, sections, include_raw)
+    )
+
+async def _route_prices(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if not assets:
+        # default to ETH and BTC if none found
+        assets = ["coingecko:ethereum", "coingecko:bitcoin"]
+    coins_param = ",".join(assets)
+    async def fetch_prices():
+        resp = await safe_http_request(
+            'GET',
+            f"{_DEFILLAMA_COINS_URL}/prices/current/{coins_param}"
+        )
+        return _defillama_result(resp, "/prices/current/{coins}", coins=assets)
+    return await _defillama_cached(f"prices:{coins_param}", 30.0, fetch_prices)
+
+async def _route_historical_prices(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if not assets:
+        return {"success": False, "error": "Specify tokens (e.g., bitcoin, ethereum) to fetch historical prices"}
+    # naive timestamp extraction
+    ts_match = _HISTORICAL_TS_RE.search(q)
+    if not ts_match:
+        return {"success": False, "error": "Specify UNIX timestamp for historical prices"}
+    timestamp = ts_match.group(2)
+    coins_param = ",".join(assets)
+    resp = await safe_http_request(
+        'GET',
+        f"{_DEFILLAMA_COINS_URL}/prices/historical/{timestamp}/{coins_param}"
+    )
+    return _defillama_result(resp, "/prices/historical/{timestamp}/{coins}", coins=assets, timestamp=timestamp)
+
+async def _route_percentage(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if not assets:
+        return {"success": False, "error": "Specify tokens (e.g., bitcoin, ethereum) for percentage endpoint"}
+    coins_param = ",".join(assets)
+    params = {}
+    period_match = _PERIOD_RE.search(q)
+    if period_match:
+        params["period"] = period_match.group(1)
+    ts_match = _TIMESTAMP_RE.search(q)
+    if ts_match:
+        params["timestamp"] = ts_match.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_COINS_URL}/percentage/{coins_param}", params=params)
+    return _defillama_result(resp, "/percentage/{coins}", coins=assets, params=params)
+
+async def _route_first_price(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if not assets:
+        return {"success": False, "error": "Specify tokens for /prices/first"}
+    coins_param = ",".join(assets)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_COINS_URL}/prices/first/{coins_param}")
+    return _defillama_result(resp, "/prices/first/{coins}", coins=assets)
+
+async def _route_coin_chart(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if not assets:
+        return {"success": False, "error": "Specify tokens for /chart/{coins}"}
+    coins_param = ",".join(assets)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_COINS_URL}/chart/{coins_param}")
+    return _defillama_result(resp, "/chart/{coins}", coins=assets)
+
+async def _route_batch_historical(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    return {"success": False, "error": "Provide explicit coins/timestamps mapping via UI to use /batchHistorical"}
+
+async def _route_block(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if not chain_filter:
+        return {"success": False, "error": "Specify chain for /block/{chain}/{timestamp}"}
+    ts_match = _TIMESTAMP_RE.search(q)
+    if not ts_match:
+        return {"success": False, "error": "Specify UNIX timestamp for /block/{chain}/{timestamp}"}
+    timestamp = ts_match.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_COINS_URL}/block/{chain_filter}/{timestamp}")
+    return _defillama_result(resp, "/block/{chain}/{timestamp}", chain=chain_filter, timestamp=timestamp)
+
+async def _route_protocol(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    # naive extraction: last word after 'protocol' or use known ones
+    protocol_slug = None
+    for p in _DEFILLAMA_KNOWN_PROTOCOLS:
+        if p in q:
+            protocol_slug = p
+            break
+    if protocol_slug:
+        resp = await safe_http_request('GET', 
+            f"{_DEFILLAMA_URL}/protocol/{protocol_slug}"
+        )
+        if resp.is_success:
+            return _defillama_result(resp, "/protocol/{protocol}", protocol=protocol_slug)
+        # Try protocol TVL timeseries if available
+        resp2 = await safe_http_request('GET', f"{_DEFILLAMA_URL}/tvl/{protocol_slug}")
+        if resp2.is_success:
+            return _defillama_result(resp2, "/tvl/{protocol}", protocol=protocol_slug)
+    # fallback: list protocols with tvl
+    async def fetch_protocols():
+        resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/protocols")
+        return _defillama_result(resp, "/protocols")
+    return await _defillama_cached("protocols", 120.0, fetch_protocols)
+
+async def _route_chain_tvl(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    ch = chain_filter or "Ethereum"
+    resp = await safe_http_request('GET', 
+        f"{_DEFILLAMA_URL}/v2/historicalChainTvl/{ch}"
+    )
+    return _defillama_result(resp, "/v2/historicalChainTvl/{chain}", chain=ch)
+
+async def _route_chains(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    return await _defillama_cached("chains", 120.0, _defillama_chains)
+
+async def _route_stablecoins(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    # charts overview
+    if "chart" in kws or "charts" in kws or "overview" in kws:
+        resp = await safe_http_request('GET', f"{_DEFILLAMA_STABLECOINS_URL}/stablecoincharts/all")
+        if resp.is_success:
+            return _defillama_result(resp, "/stablecoincharts/all")
+    # default: list stablecoins and metrics
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_STABLECOINS_URL}/stablecoins")
+    return _defillama_result(resp, "/stablecoins")
+
+async def _route_yields(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_YIELDS_URL}/pools")
+    # in case pools endpoint differs, fallback to poolsOld from spec
+    if not resp.is_success:
+        resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/yields/poolsOld")
+    return _defillama_result(resp, "yields")
+
+async def _route_pool_chart(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    pool_match = _POOL_ID_RE.search(q)
+    if not pool_match:
+        return None
+    pool_id = pool_match.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_YIELDS_URL}/chart/{pool_id}")
+    return _defillama_result(resp, "/chart/{pool}", pool=pool_id)
+
+async def _route_dex_volumes(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if chain_filter:
+        resp = await safe_http_request('GET', 
+            f"{_DEFILLAMA_URL}/overview/dexs/{chain_filter}",
+            params=_DEFILLAMA_EXCLUDE_CHARTS
+        )
+    else:
+        resp = await safe_http_request('GET', 
+            f"{_DEFILLAMA_URL}/overview/dexs",
+            params=_DEFILLAMA_EXCLUDE_CHARTS
+        )
+    return _defillama_result(resp, "/overview/dexs", chain=chain_filter)
+
+async def _route_dex_summary(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    # Expect 'protocol: <slug>' pattern to avoid guessing
+    m = _PROTOCOL_SLUG_RE.search(q)
+    if not m:
+        return {"success": False, "error": "Provide 'protocol: <slug>' for /summary/dexs/{protocol}"}
+    slug = m.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/summary/dexs/{slug}")
+    return _defillama_result(resp, "/summary/dexs/{protocol}", protocol=slug)
+
+async def _route_options(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if chain_filter:
+        resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/overview/options/{chain_filter}", params=_DEFILLAMA_EXCLUDE_CHARTS)
+    else:
+        resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/overview/options", params=_DEFILLAMA_EXCLUDE_CHARTS)
+    return _defillama_result(resp, "/overview/options", chain=chain_filter)
+
+async def _route_options_summary(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    m = _PROTOCOL_SLUG_RE.search(q)
+    if not m:
+        return {"success": False, "error": "Provide 'protocol: <slug>' for /summary/options/{protocol}"}
+    slug = m.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/summary/options/{slug}")
+    return _defillama_result(resp, "/summary/options/{protocol}", protocol=slug)
+
+async def _route_fees(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if chain_filter:
+        resp = await safe_http_request('GET', 
+            f"{_DEFILLAMA_URL}/overview/fees/{chain_filter}",
+            params=_DEFILLAMA_EXCLUDE_CHARTS
+        )
+    else:
+        resp = await safe_http_request('GET', 
+            f"{_DEFILLAMA_URL}/overview/fees",
+            params=_DEFILLAMA_EXCLUDE_CHARTS
+        )
+    return _defillama_result(resp, "/overview/fees", chain=chain_filter)
+
+async def _route_fees_summary(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    m = _PROTOCOL_SLUG_RE.search(q)
+    if not m:
+        return {"success": False, "error": "Provide 'protocol: <slug>' for /summary/fees/{protocol}"}
+    slug = m.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_URL}/summary/fees/{slug}")
+    return _defillama_result(resp, "/summary/fees/{protocol}", protocol=slug)
+
+async def _route_bridges(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    if chain_filter:
+        resp = await safe_http_request('GET', 
+            f"{_DEFILLAMA_BRIDGES_URL}/bridgevolume/{chain_filter}"
+        )
+    else:
+        resp = await safe_http_request('GET', f"{_DEFILLAMA_BRIDGES_URL}/bridges")
+    return _defillama_result(resp, "/bridges or /bridgevolume/{chain}", chain=chain_filter)
+
+async def _route_bridge_summary(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    m = _BRIDGE_ID_RE.search(q)
+    if not m:
+        return {"success": False, "error": "Provide 'id: <bridgeId>' for /bridge/{id}"}
+    bridge_id = m.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_BRIDGES_URL}/bridge/{bridge_id}")
+    return _defillama_result(resp, "/bridge/{id}", id=bridge_id)
+
+async def _route_bridge_day_stats(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    ts_match = _TIMESTAMP_RE.search(q)
+    if not (ts_match and chain_filter):
+        return {"success": False, "error": "Provide timestamp and chain for /bridgedaystats/{timestamp}/{chain}"}
+    timestamp = ts_match.group(1)
+    # optional id
+    id_match = _BRIDGE_ID_RE.search(q)
+    params = {"id": id_match.group(1)} if id_match else None
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_BRIDGES_URL}/bridgedaystats/{timestamp}/{chain_filter}", params=params)
+    return _defillama_result(resp, "/bridgedaystats/{timestamp}/{chain}", chain=chain_filter, timestamp=timestamp, params=params)
+
+async def _route_bridge_transactions(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    m = _BRIDGE_ID_RE.search(q)
+    if not m:
+        return {"success": False, "error": "Provide 'id: <bridgeId>' for /transactions/{id}"}
+    bridge_id = m.group(1)
+    params: Dict[str, Any] = {}
+    for key, pattern in _TX_FILTER_RES.items():
+        m2 = pattern.search(q)
+        if m2:
+            params[key] = m2.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_BRIDGES_URL}/transactions/{bridge_id}", params=params or None)
+    return _defillama_result(resp, "/transactions/{id}", id=bridge_id, params=params)
+
+async def _route_stablecoin_chains(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_STABLECOINS_URL}/stablecoinchains")
+    return _defillama_result(resp, "/stablecoinchains")
+
+async def _route_stablecoin_prices(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_STABLECOINS_URL}/stablecoinprices")
+    return _defillama_result(resp, "/stablecoinprices")
+
+async def _route_stablecoin_asset(q: str, kws: set, chain_filter: Optional[str], assets: List[str]):
+    # Expect 'asset: <slug>' to avoid guessing
+    m = _ASSET_SLUG_RE.search(q)
+    if not m:
+        return {"success": False, "error": "Provide 'asset: <stablecoin-slug>' for /stablecoin/{asset}"}
+    asset = m.group(1)
+    resp = await safe_http_request('GET', f"{_DEFILLAMA_STABLECOINS_URL}/stablecoin/{asset}")
+    return _defillama_result(resp, "/stablecoin/{asset}", asset=asset)
+
+# (matches(kws, assets), handler) in priority order; the first matching route
+# that returns a result wins
+_DEFILLAMA_ROUTES = (
+    # Aggregated DefiLlama data collection for TVL, stablecoins, DEX, fees, yields, bridges
+    (lambda kws, assets: bool(kws & _DEFILLAMA_AGGREGATE_TRIGGERS) and kws.isdisjoint(_DEFILLAMA_AGGREGATE_EXCLUDES),
+     _route_aggregate),
+    # 1) Prices
+    (lambda kws, assets: bool(kws & _DEFILLAMA_PRICE_TRIGGERS), _route_prices),
+    # 1.a) Historical prices for tokens by timestamp
+    (lambda kws, assets: ("historical" in kws and "price" in kws) or "/prices/historical" in kws,
+     _route_historical_prices),
+    # 1.b) Percentage change over time for coins
+    (lambda kws, assets: "percentage" in kws and ("coin" in kws or "coins" in kws or bool(assets)),
+     _route_percentage),
+    # 1.c) First price record for coins
+    (lambda kws, assets: "first price" in kws or "/prices/first" in kws, _route_first_price),
+    # 1.d) Price chart for coins
+    (lambda kws, assets: ("chart" in kws and ("coin" in kws or "coins" in kws)) or "/chart/" in kws,
+     _route_coin_chart),
+    # 1.e) Batch historical prices (requires explicit JSON coins mapping)
+    (lambda kws, assets: "batch" in kws and "historical" in kws and ("price" in kws or "prices" in kws),
+     _route_batch_historical),
+    # 1.f) Get nearest block to a timestamp on a chain
+    (lambda kws, assets: "block" in kws and "timestamp" in kws, _route_block),
+    # 2) Protocol TVL detail (if protocol mentioned)
+    (lambda kws, assets: bool(kws & _DEFILLAMA_PROTOCOL_TRIGGERS), _route_protocol),
+    # 3) Chain TVL historical
+    (lambda kws, assets: "chain" in kws and "tvl" in kws, _route_chain_tvl),
+    # 3.a) All chains snapshot
+    (lambda kws, assets: "chains" in kws and "bridge" not in kws, _route_chains),
+    # 4) Stablecoins
+    (lambda kws, assets: "stablecoin" in kws or "stablecoins" in kws, _route_stablecoins),
+    # 5) Yields / APY
+    (lambda kws, assets: bool(kws & _DEFILLAMA_YIELD_TRIGGERS), _route_yields),
+    # 5.a) Yield pool chart when a pool id is present
+    (lambda kws, assets: ("chart" in kws and "pool" in kws) or "/chart/" in kws, _route_pool_chart),
+    # 6) DEX volumes
+    (lambda kws, assets: "dex" in kws or "volume" in kws, _route_dex_volumes),
+    # 6.a) DEX summary for a specific protocol (requires slug)
+    (lambda kws, assets: "summary" in kws and "dex" in kws, _route_dex_summary),
+    # 6.b) Options overview/summary
+    (lambda kws, assets: "options" in kws, _route_options),
+    (lambda kws, assets: "summary" in kws and "options" in kws, _route_options_summary),
+    # 7) Fees and revenue
+    (lambda kws, assets: "fees" in kws or "revenue" in kws, _route_fees),
+    # 7.a) Fees summary per protocol
+    (lambda kws, assets: "summary" in kws and "fees" in kws, _route_fees_summary),
+    # 8) Bridges
+    (lambda kws, assets: "bridge" in kws or "bridges" in kws, _route_bridges),
+    # 8.a) Bridge summary by id
+    (lambda kws, assets: "/bridge/" in kws or ("bridge" in kws and "id" in kws and "summary" in kws),
+     _route_bridge_summary),
+    # 8.b) Bridge day stats
+    (lambda kws, assets: "bridgedaystats" in kws, _route_bridge_day_stats),
+    # 8.c) Bridge transactions by id with optional filters
+    (lambda kws, assets: "transactions" in kws and ("bridge" in kws or "/transactions/" in kws),
+     _route_bridge_transactions),
+    # 9) Stablecoin utilities: stablecoinchains, stablecoinprices, specific asset
+    (lambda kws, assets: "stablecoinchains" in kws, _route_stablecoin_chains),
+    (lambda kws, assets: "stablecoinprices" in kws, _route_stablecoin_prices),
+    (lambda kws, assets: "stablecoin" in kws and ("asset" in kws or "/stablecoin/" in kws),
+     _route_stablecoin_asset),
+)
 
-            aggregate = {
-                "aggregate": True,
-                "tvl": tvl_summary,
-                "stablecoins": stablecoins_summary,
-                "dex": dex_summary,
-                "fees": fees_summary,
-                "yields": yields_summary,
-                "bridges": bridges_summary
-            }
+@tool
+@_single_flight
+async def defillama_tool(query: str) -> Dict[str, Any]:
+    """
+    Get DeFi ecosystem data from DefiLlama using multiple routes.
 
-            return {
-                "success": True,
-                "data": aggregate,
-                "metadata": {"endpoint": "aggregate", "chain": chain_filter},
-                "source": "defillama"
-            }
+    Supports: prices, TVL (protocol/chain), stablecoins, yields/APY, DEX volumes, fees/revenue, bridges.
 
-        # 1) Prices
-        if any(k in q for k in ["price", "prices", "quote"]):
-            assets = extract_known_coingecko_assets(q)
-            if not assets:
-                # default to ETH and BTC if none found
-                assets = ["coingecko:ethereum", "coingecko:bitcoin"]
-            coins_param = ",".join(assets)
-            resp = await safe_http_request(
-                'GET',
-                f"{MCPConfig.BASE_URLS['defillama_coins']}/prices/current/{coins_param}"
-            )
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/prices/current/{coins}", "coins": assets},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 1.a) Historical prices for tokens by timestamp
-        if ("historical" in q and "price" in q) or "/prices/historical" in q:
-            assets = extract_known_coingecko_assets(q)
-            if not assets:
-                return {"success": False, "error": "Specify tokens (e.g., bitcoin, ethereum) to fetch historical prices"}
-            # naive timestamp extraction
-            ts_match = re.search(r"(19|20|21|22|23|24)?\b(\d{10})\b", q)
-            if not ts_match:
-                return {"success": False, "error": "Specify UNIX timestamp for historical prices"}
-            timestamp = ts_match.group(2)
-            coins_param = ",".join(assets)
-            resp = await safe_http_request(
-                'GET',
-                f"{MCPConfig.BASE_URLS['defillama_coins']}/prices/historical/{timestamp}/{coins_param}"
-            )
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/prices/historical/{timestamp}/{coins}", "coins": assets, "timestamp": timestamp},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 1.b) Percentage change over time for coins
-        if "percentage" in q and ("coin" in q or "coins" in q or any(sym in q for sym in ASSET_NAME_TO_COINGECKO.keys())):
-            assets = extract_known_coingecko_assets(q)
-            if not assets:
-                return {"success": False, "error": "Specify tokens (e.g., bitcoin, ethereum) for percentage endpoint"}
-            coins_param = ",".join(assets)
-            params = {}
-            period_match = re.search(r"(\b\d+[wdhm]\b)", q)
-            if period_match:
-                params["period"] = period_match.group(1)
-            ts_match = re.search(r"\b(\d{10})\b", q)
-            if ts_match:
-                params["timestamp"] = ts_match.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_coins']}/percentage/{coins_param}", params=params)
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/percentage/{coins}", "coins": assets, "params": params}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 1.c) First price record for coins
-        if ("first price" in q) or "/prices/first" in q:
-            assets = extract_known_coingecko_assets(q)
-            if not assets:
-                return {"success": False, "error": "Specify tokens for /prices/first"}
-            coins_param = ",".join(assets)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_coins']}/prices/first/{coins_param}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/prices/first/{coins}", "coins": assets}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 1.d) Price chart for coins
-        if ("chart" in q and ("coin" in q or "coins" in q)) or "/chart/" in q:
-            assets = extract_known_coingecko_assets(q)
-            if not assets:
-                return {"success": False, "error": "Specify tokens for /chart/{coins}"}
-            coins_param = ",".join(assets)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_coins']}/chart/{coins_param}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/chart/{coins}", "coins": assets}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 1.e) Batch historical prices (requires explicit JSON coins mapping)
-        if "batch" in q and "historical" in q and ("price" in q or "prices" in q):
-            return {"success": False, "error": "Provide explicit coins/timestamps mapping via UI to use /batchHistorical"}
-
-        # 1.f) Get nearest block to a timestamp on a chain
-        if "block" in q and "timestamp" in q:
-            chain = extract_chain_from_text(q)
-            if not chain:
-                return {"success": False, "error": "Specify chain for /block/{chain}/{timestamp}"}
-            ts_match = re.search(r"\b(\d{10})\b", q)
-            if not ts_match:
-                return {"success": False, "error": "Specify UNIX timestamp for /block/{chain}/{timestamp}"}
-            timestamp = ts_match.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_coins']}/block/{chain}/{timestamp}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/block/{chain}/{timestamp}", "chain": chain, "timestamp": timestamp}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 2) Protocol TVL detail (if protocol mentioned)
-        if any(k in q for k in ["tvl", "protocol", "defi"]):
-            # naive extraction: last word after 'protocol' or use known ones
-            protocol_slug = None
-            known_protocols = [
-                "aave", "curve", "uniswap", "makerdao", "compound", "rocket-pool", "lido"
-            ]
-            for p in known_protocols:
-                if p in q:
-                    protocol_slug = p
-                    break
-            if protocol_slug:
-                resp = await safe_http_request('GET', 
-                    f"{MCPConfig.BASE_URLS['defillama']}/protocol/{protocol_slug}"
-                )
-                if resp.status_code == 200:
-                    return {
-                        "success": True,
-                        "data": resp.json(),
-                        "metadata": {"endpoint": "/protocol/{protocol}", "protocol": protocol_slug},
-                        "source": "defillama"
-                    }
-                # Try protocol TVL timeseries if available
-                resp2 = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/tvl/{protocol_slug}")
-                if 200 <= resp2.status_code < 300:
-                    return {
-                        "success": True,
-                        "data": resp2.json(),
-                        "metadata": {"endpoint": "/tvl/{protocol}", "protocol": protocol_slug},
-                        "source": "defillama"
-                    }
-            # fallback: list protocols with tvl
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/protocols")
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/protocols"},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
+    Args:
+        query: Natural language query indicating the desired DefiLlama data.
 
-        # 3) Chain TVL historical
-        if "chain" in q and "tvl" in q:
-            ch = extract_chain_from_text(q) or "Ethereum"
-            resp = await safe_http_request('GET', 
-                f"{MCPConfig.BASE_URLS['defillama']}/v2/historicalChainTvl/{ch}"
-            )
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/v2/historicalChainTvl/{chain}", "chain": ch},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 3.a) All chains snapshot
-        if "chains" in q and not ("bridge" in q):
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/v2/chains")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/v2/chains"}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 4) Stablecoins
-        if "stablecoin" in q or "stablecoins" in q:
-            # charts overview
-            if "chart" in q or "charts" in q or "overview" in q:
-                resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_stablecoins']}/stablecoincharts/all")
-                if resp.status_code == 200:
-                    return {
-                        "success": True,
-                        "data": resp.json(),
-                        "metadata": {"endpoint": "/stablecoincharts/all"},
-                        "source": "defillama"
-                    }
-            # default: list stablecoins and metrics
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_stablecoins']}/stablecoins")
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/stablecoins"},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 5) Yields / APY
-        if any(k in q for k in ["yield", "yields", "apy", "lending", "borrow"]):
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_yields']}/pools")
-            # in case pools endpoint differs, fallback to poolsOld from spec
-            if resp.status_code != 200:
-                resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/yields/poolsOld")
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "yields"},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 5.a) Yield pool chart when a pool id is present
-        if ("chart" in q and "pool" in q) or "/chart/" in q:
-            pool_match = re.search(r"pool\s*[:=\s]([0-9a-f\-]{8,})", q)
-            if pool_match:
-                pool_id = pool_match.group(1)
-                resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_yields']}/chart/{pool_id}")
-                if resp.status_code == 200:
-                    return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/chart/{pool}", "pool": pool_id}, "source": "defillama"}
-                return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 6) DEX volumes
-        if "dex" in q or "volume" in q:
-            ch = extract_chain_from_text(q)
-            if ch:
-                resp = await safe_http_request('GET', 
-                    f"{MCPConfig.BASE_URLS['defillama']}/overview/dexs/{ch}",
-                    params={"excludeTotalDataChart": "true", "excludeTotalDataChartBreakdown": "true"}
-                )
-            else:
-                resp = await safe_http_request('GET', 
-                    f"{MCPConfig.BASE_URLS['defillama']}/overview/dexs",
-                    params={"excludeTotalDataChart": "true", "excludeTotalDataChartBreakdown": "true"}
-                )
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/overview/dexs", "chain": ch},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 6.a) DEX summary for a specific protocol (requires slug)
-        if "summary" in q and "dex" in q:
-            # Expect 'protocol: <slug>' pattern to avoid guessing
-            m = re.search(r"protocol\s*[:=]\s*([a-z0-9\-]+)", q)
-            if not m:
-                return {"success": False, "error": "Provide 'protocol: <slug>' for /summary/dexs/{protocol}"}
-            slug = m.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/summary/dexs/{slug}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/summary/dexs/{protocol}", "protocol": slug}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 6.b) Options overview/summary
-        if "options" in q:
-            ch = extract_chain_from_text(q)
-            params = {"excludeTotalDataChart": "true", "excludeTotalDataChartBreakdown": "true"}
-            if ch:
-                resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/overview/options/{ch}", params=params)
-            else:
-                resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/overview/options", params=params)
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/overview/options", "chain": ch}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        if "summary" in q and "options" in q:
-            m = re.search(r"protocol\s*[:=]\s*([a-z0-9\-]+)", q)
-            if not m:
-                return {"success": False, "error": "Provide 'protocol: <slug>' for /summary/options/{protocol}"}
-            slug = m.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/summary/options/{slug}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/summary/options/{protocol}", "protocol": slug}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 7) Fees and revenue
-        if "fees" in q or "revenue" in q:
-            ch = extract_chain_from_text(q)
-            if ch:
-                resp = await safe_http_request('GET', 
-                    f"{MCPConfig.BASE_URLS['defillama']}/overview/fees/{ch}",
-                    params={"excludeTotalDataChart": "true", "excludeTotalDataChartBreakdown": "true"}
-                )
-            else:
-                resp = await safe_http_request('GET', 
-                    f"{MCPConfig.BASE_URLS['defillama']}/overview/fees",
-                    params={"excludeTotalDataChart": "true", "excludeTotalDataChartBreakdown": "true"}
-                )
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/overview/fees", "chain": ch},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 7.a) Fees summary per protocol
-        if "summary" in q and "fees" in q:
-            m = re.search(r"protocol\s*[:=]\s*([a-z0-9\-]+)", q)
-            if not m:
-                return {"success": False, "error": "Provide 'protocol: <slug>' for /summary/fees/{protocol}"}
-            slug = m.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/summary/fees/{slug}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/summary/fees/{protocol}", "protocol": slug}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 8) Bridges
-        if "bridge" in q or "bridges" in q:
-            ch = extract_chain_from_text(q)
-            if ch:
-                resp = await safe_http_request('GET', 
-                    f"{MCPConfig.BASE_URLS['defillama_bridges']}/bridgevolume/{ch}"
-                )
-            else:
-                resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_bridges']}/bridges")
-            if resp.status_code == 200:
-                return {
-                    "success": True,
-                    "data": resp.json(),
-                    "metadata": {"endpoint": "/bridges or /bridgevolume/{chain}", "chain": ch},
-                    "source": "defillama"
-                }
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 8.a) Bridge summary by id
-        if "/bridge/" in q or ("bridge" in q and "id" in q and "summary" in q):
-            m = re.search(r"id\s*[:=]\s*(\d+)", q)
-            if not m:
-                return {"success": False, "error": "Provide 'id: <bridgeId>' for /bridge/{id}"}
-            bridge_id = m.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_bridges']}/bridge/{bridge_id}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/bridge/{id}", "id": bridge_id}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 8.b) Bridge day stats
-        if "bridgedaystats" in q:
-            ts_match = re.search(r"\b(\d{10})\b", q)
-            ch = extract_chain_from_text(q)
-            if not (ts_match and ch):
-                return {"success": False, "error": "Provide timestamp and chain for /bridgedaystats/{timestamp}/{chain}"}
-            timestamp = ts_match.group(1)
-            # optional id
-            id_match = re.search(r"id\s*[:=]\s*(\d+)", q)
-            params = {"id": id_match.group(1)} if id_match else None
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_bridges']}/bridgedaystats/{timestamp}/{ch}", params=params)
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/bridgedaystats/{timestamp}/{chain}", "chain": ch, "timestamp": timestamp, "params": params}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 8.c) Bridge transactions by id with optional filters
-        if "transactions" in q and ("bridge" in q or "/transactions/" in q):
-            m = re.search(r"id\s*[:=]\s*(\d+)", q)
-            if not m:
-                return {"success": False, "error": "Provide 'id: <bridgeId>' for /transactions/{id}"}
-            bridge_id = m.group(1)
-            params: Dict[str, Any] = {}
-            for key in ["starttimestamp", "endtimestamp", "sourcechain", "address", "limit"]:
-                m2 = re.search(rf"{key}\s*[:=]\s*([^\s]+)", q)
-                if m2:
-                    params[key] = m2.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_bridges']}/transactions/{bridge_id}", params=params or None)
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/transactions/{id}", "id": bridge_id, "params": params}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        # 9) Stablecoin utilities: stablecoinchains, stablecoinprices, specific asset
-        if "stablecoinchains" in q:
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_stablecoins']}/stablecoinchains")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/stablecoinchains"}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        if "stablecoinprices" in q:
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_stablecoins']}/stablecoinprices")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/stablecoinprices"}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
-
-        if "stablecoin" in q and ("asset" in q or "/stablecoin/" in q):
-            # Expect 'asset: <slug>' to avoid guessing
-            m = re.search(r"asset\s*[:=]\s*([a-z0-9\-]+)", q)
-            if not m:
-                return {"success": False, "error": "Provide 'asset: <stablecoin-slug>' for /stablecoin/{asset}"}
-            asset = m.group(1)
-            resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama_stablecoins']}/stablecoin/{asset}")
-            if resp.status_code == 200:
-                return {"success": True, "data": resp.json(), "metadata": {"endpoint": "/stablecoin/{asset}", "asset": asset}, "source": "defillama"}
-            return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
+    Returns:
+        Dictionary with data, metadata, and source identifiers.
+    """
+    try:
+        q = (query or "").lower()
+        kws = _DEFILLAMA_CLASSIFIER.classify(q)
+        # Both depend only on q; resolve them once for every route
+        chain_filter = extract_chain_from_text(q)
+        assets = extract_known_coingecko_assets(q)
+
+        for matches, handler in _DEFILLAMA_ROUTES:
+            if matches(kws, assets):
+                result = await handler(q, kws, chain_filter, assets)
+                if result is not None:
+                    return result
 
         # 10) Pro-only endpoints guard (no API key configured here)
-        pro_markers = [
-            "tokenprotocols", "inflows", "chainassets", "activeusers", "userdata", "emissions", "emission", "categories", "forks", "oracles", "hacks", "raises", "treasuries", "entities", "historicalliquidity",
-            "poolsborrow", "chartlendborrow", "perps", "lsdrates", "etfs", "fdv", "derivatives"
-        ]
-        if any(marker in q.replace(" ", "") for marker in pro_markers):
+        if _names_pro_endpoint(q):
             return {
                 "success": False,
                 "error": "Requested endpoint is Pro-only on DefiLlama and is not accessible without credentials",
@@ -1419,20 +2007,69 @@ async def defillama_tool(query: str) -> Dict[str, Any]:
             }
 
         # Default fallback: list chains
-        resp = await safe_http_request('GET', f"{MCPConfig.BASE_URLS['defillama']}/v2/chains")
-        if resp.status_code == 200:
-            return {
-                "success": True,
-                "data": resp.json(),
-                "metadata": {"endpoint": "/v2/chains"},
-                "source": "defillama"
-            }
-        return {"success": False, "error": f"HTTP {resp.status_code}", "source": "defillama"}
+        return await _defillama_cached("chains", 120.0, _defillama_chains)
 
     except Exception as e:
         logger.error(f"DefiLlama error: {e}")
         return {"success": False, "error": str(e), "source": "defillama"}
 
+# CoinMarketCap endpoints and request headers, fixed for the process
+_CMC_URL = MCPConfig.BASE_URLS["coinmarketcap"]
+_CMC_MAP_URL = f"{_CMC_URL}/cryptocurrency/map"
+_CMC_INFO_URL = f"{_CMC_URL}/cryptocurrency/info"
+_CMC_QUOTES_URL = f"{_CMC_URL}/cryptocurrency/quotes/latest"
+_CMC_HEADERS: Mapping[str, str] = MappingProxyType({
+    "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY,
+    "Accept": "application/json",
+})
+_CMC_LISTINGS_URL = f"{_CMC_URL}/cryptocurrency/listings/latest"
+_CMC_NO_PARAMS: Mapping[str, str] = MappingProxyType({})
+# Listings by market cap: 20 rows for ranking queries, 25 for the general default
+_CMC_LISTINGS_PARAMS_20: Mapping[str, str] = MappingProxyType({
+    "start": "1", "limit": "20", "convert": "USD", "sort": "market_cap", "sort_dir": "desc",
+})
+_CMC_LISTINGS_PARAMS_25: Mapping[str, str] = MappingProxyType({**_CMC_LISTINGS_PARAMS_20, "limit": "25"})
+# Market-wide CMC snapshots are reused this long; key usage is always live
+_CMC_MARKET_TTL = 30.0
+# coinmarketcap_tool (keywords, url, params, cache ttl) per query keyword group,
+# in priority order; queries matching none get the 25-row listings
+_CMC_ENDPOINTS: Tuple[Tuple[Tuple[str, ...], str, Mapping[str, str], float], ...] = (
+    (("key info", "api usage", "limits"), f"{_CMC_URL}/key/info", _CMC_NO_PARAMS, 0.0),
+    (("global", "total market", "global metrics"), f"{_CMC_URL}/global-metrics/quotes/latest", _CMC_NO_PARAMS, _CMC_MARKET_TTL),
+    (("trending",), f"{_CMC_URL}/cryptocurrency/trending/latest", _CMC_NO_PARAMS, _CMC_MARKET_TTL),
+    (("ranking", "market cap", "top"), _CMC_LISTINGS_URL, _CMC_LISTINGS_PARAMS_20, _CMC_MARKET_TTL),
+)
+
+_MISS = object()
+
+# The CMC symbol -> id map only changes on listings and /info metadata
+# rarely; unknown symbols are remembered briefly so they don't re-query
+_CMC_ID_TTL = 86400.0
+_CMC_INFO_TTL = 3600.0
+_CMC_NEGATIVE_TTL = 60.0
+_cmc_id_cache = _TTLCache(maxsize=2048)
+_cmc_info_cache = _TTLCache(maxsize=2048)
+# Per-loop, per-key locks so concurrent misses share one upstream fetch
+_cmc_locks: _KeyedLocks = weakref.WeakKeyDictionary()
+
+async def _cmc_cached(cache: _TTLCache, key: str, fetch):
+    """Return the cached value for ``key``, or await ``fetch()`` once per key.
+    
+    ``fetch`` returns ``(value, ttl)``; a ttl of None leaves the value uncached.
+    """
+    value = cache.get(key, _MISS)
+    if value is not _MISS:
+        return value
+    async with _keyed_lock(_cmc_locks, key):
+        # Another task may have filled the entry while we waited
+        value = cache.get(key, _MISS)
+        if value is not _MISS:
+            return value
+        value, ttl = await fetch()
+        if ttl is not None:
+            cache.set(key, value, ttl)
+        return value
+
 async def get_crypto_id_by_symbol(symbol: str) -> Optional[int]:
     """
     Get CMC ID for a cryptocurrency by its symbol using the map endpoint.
@@ -1443,26 +2080,27 @@ async def get_crypto_id_by_symbol(symbol: str) -> Optional[int]:
     Returns:
         CMC ID if found, None otherwise
     """
-    try:
-        headers = {
-            "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY,
-            "Accept": "application/json"
-        }
+    symbol = symbol.upper()
 
+    async def fetch_id():
         # Use map endpoint to find CMC ID
         response = await safe_http_request(
             'GET',
-            f"{MCPConfig.BASE_URLS['coinmarketcap']}/cryptocurrency/map",
-            headers=headers,
-            params={"symbol": symbol.upper(), "limit": 1}
+            _CMC_MAP_URL,
+            headers=_CMC_HEADERS,
+            params={"symbol": symbol, "limit": 1}
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = _fast_json(response)
             if data.get("data") and len(data["data"]) > 0:
-                return data["data"][0].get("id")
+                return data["data"][0].get("id"), _CMC_ID_TTL
+            return None, _CMC_NEGATIVE_TTL
         
-        return None
+        return None, None
+
+    try:
+        return await _cmc_cached(_cmc_id_cache, f"id:{symbol}", fetch_id)
         
     except Exception as e:
         logger.error(f"Error getting CMC ID for {symbol}: {e}")
@@ -1478,29 +2116,29 @@ async def get_crypto_info_by_id(cmc_id: int) -> Dict[str, Any]:
     Returns:
         Detailed cryptocurrency metadata
     """
-    try:
-        headers = {
-            "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY,
-            "Accept": "application/json"
-        }
-        
+    async def fetch_info():
         response = await safe_http_request(
             'GET',
-            f"{MCPConfig.BASE_URLS['coinmarketcap']}/cryptocurrency/info",
-            headers=headers,
+            _CMC_INFO_URL,
+            headers=_CMC_HEADERS,
             params={"id": str(cmc_id)}
         )
         
         if response.status_code == 200:
-            return response.json()
+            return _fast_json(response), _CMC_INFO_TTL
         else:
-            return {"success": False, "error": f"HTTP {response.status_code}"}
+            return {"success": False, "error": f"HTTP {response.status_code}"}, None
+
+    try:
+        # Copy so callers can't mutate the cached payload
+        return dict(await _cmc_cached(_cmc_info_cache, f"info:{cmc_id}", fetch_info))
             
     except Exception as e:
         logger.error(f"Error getting crypto info for ID {cmc_id}: {e}")
         return {"success": False, "error": str(e)}
 
 @tool
+@_single_flight
 async def coinmarketcap_tool(query: str) -> Dict[str, Any]:
     """
     Get cryptocurrency market data from CoinMarketCap Pro API.
@@ -1515,55 +2153,28 @@ async def coinmarketcap_tool(query: str) -> Dict[str, Any]:
         return {"success": False, "error": "CoinMarketCap API key not configured"}
     
     try:
-        headers = {
-            "X-CMC_PRO_API_KEY": COINMARKETCAP_API_KEY,
-            "Accept": "application/json"
-        }
-        
         # Try to detect a specific cryptocurrency symbol/name in ANY query
         query_lower = query.lower()
-        symbol_map = {
-            # Common names to symbols (union of maps)
-            "bitcoin": "BTC", "btc": "BTC",
-            "ethereum": "ETH", "eth": "ETH", 
-            "cardano": "ADA", "ada": "ADA",
-            "solana": "SOL", "sol": "SOL",
-            "polkadot": "DOT", "dot": "DOT",
-            "chainlink": "LINK", "link": "LINK",
-            "litecoin": "LTC", "ltc": "LTC",
-            "dogecoin": "DOGE", "doge": "DOGE",
-            "ripple": "XRP", "xrp": "XRP",
-            "binance coin": "BNB", "bnb": "BNB",
-            "polygon": "MATIC", "matic": "MATIC",
-            "avalanche": "AVAX", "avax": "AVAX",
-            "tether": "USDT", "usdt": "USDT",
-            "usd coin": "USDC", "usdc": "USDC"
-        }
-        target_symbol: Optional[str] = None
-        for name, symbol in symbol_map.items():
-            if name in query_lower:
-                target_symbol = symbol
-                break
+        # Lowest-ranked hit wins, matching the mapping's priority order
+        hit = min((value for _, value in _CMC_SYMBOL_AUTOMATON.iter(query_lower)), default=None)
+        target_symbol: Optional[str] = CMC_NAME_TO_SYMBOL[hit[1]] if hit else None
         if not target_symbol:
-            tokens = re.findall(r"[A-Za-z]{2,10}", query)
-            for token in tokens:
+            for token in _CMC_TOKEN_RE.findall(query):
                 candidate = token.upper()
-                if candidate in set(symbol_map.values()):
+                if candidate in _CMC_KNOWN_SYMBOLS:
                     target_symbol = candidate
                     break
         
         # If a symbol was detected, prefer coin-specific quote
         if target_symbol:
-            endpoint = "/cryptocurrency/quotes/latest"
-            params = {"symbol": target_symbol, "convert": "USD"}
             response = await safe_http_request(
                 'GET',
-                f"{MCPConfig.BASE_URLS['coinmarketcap']}{endpoint}",
-                headers=headers,
-                params=params
+                _CMC_QUOTES_URL,
+                headers=_CMC_HEADERS,
+                params={"symbol": target_symbol, "convert": "USD"}
             )
             if response.status_code == 200:
-                data = response.json()
+                data = _fast_json(response)
                 return {
                     "success": True,
                     "data": data,
@@ -1573,56 +2184,33 @@ async def coinmarketcap_tool(query: str) -> Dict[str, Any]:
             else:
                 # If quotes fail, still return the error
                 try:
-                    error_data = response.json()
+                    error_data = _fast_json(response)
                     error_message = error_data.get("status", {}).get("error_message", f"HTTP {response.status_code}")
                 except Exception:
                     error_message = f"HTTP {response.status_code}"
                 return {"success": False, "error": error_message}
         
-        # Enhanced endpoint selection for comprehensive data
-        if "key info" in query.lower() or "api usage" in query.lower() or "limits" in query.lower():
-            endpoint = "/key/info"
-            params = {}
-        elif "global" in query.lower() or "total market" in query.lower() or "global metrics" in query.lower():
-            endpoint = "/global-metrics/quotes/latest"
-            params = {}
-        elif "trending" in query_lower:
-            endpoint = "/cryptocurrency/trending/latest"
-            params = {}
-        elif "ranking" in query_lower or "market cap" in query_lower or "top" in query_lower:
-            endpoint = "/cryptocurrency/listings/latest"
-            params = {
-                "start": "1",
-                "limit": "20",  # Increased for more comprehensive data
-                "convert": "USD",
-                "sort": "market_cap",
-                "sort_dir": "desc"
-            }
-        else:
-            # Enhanced default response with comprehensive market data
-            endpoint = "/cryptocurrency/listings/latest"
-            params = {
-                "start": "1",
-                "limit": "25",  # Even more comprehensive
-                "convert": "USD",
-                "sort": "market_cap",
-                "sort_dir": "desc"
-            }
+        # Enhanced endpoint selection for comprehensive data; first matching row wins
+        url, params, cache_ttl = next(
+            ((url, params, ttl) for keywords, url, params, ttl in _CMC_ENDPOINTS if any(k in query_lower for k in keywords)),
+            (_CMC_LISTINGS_URL, _CMC_LISTINGS_PARAMS_25, _CMC_MARKET_TTL)
+        )
         
-        response = await safe_http_request(
+        response = await safe_http_request_cached(
             'GET',
-            f"{MCPConfig.BASE_URLS['coinmarketcap']}{endpoint}", 
-            headers=headers,
+            url, 
+            cache_ttl,
+            headers=_CMC_HEADERS,
             params=params
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = _fast_json(response)
             return {"success": True, "data": data, "source": "coinmarketcap"}
         else:
             # Try to get error details from response
             try:
-                error_data = response.json()
+                error_data = _fast_json(response)
                 error_message = error_data.get("status", {}).get("error_message", f"HTTP {response.status_code}")
             except:
                 error_message = f"HTTP {response.status_code}"
@@ -1641,38 +2229,112 @@ async def coinmarketcap_tool(query: str) -> Dict[str, Any]:
         
         return {"success": False, "error": error_msg, "source": "coinmarketcap"}
 
-# Modern LangChain Research Chain
-class OptimizedWeb3ResearchAgent:
-    """Optimized Web3 research agent using modern LangChain patterns with session-based memory"""
+# Per-tool budget within one research turn, so a slow provider cannot hold
+# back the results of the others
+_TOOL_TIMEOUT = 15.0
+
+async def run_tools_batch(calls: List[Any]) -> List[Dict]:
+    """Run tool invocations concurrently over the shared HTTP client.
     
-    def __init__(self, session_id: str = None):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            google_api_key=GEMINI_API_KEY,
-            temperature=0.1,
-            max_tokens=4000
-        )
-        
-        # Available tools (commented out defillama since API key not provided)
-        self.tools = [
-            dune_analytics_tool,
-            etherscan_tool,
-            defillama_tool,
-            coinmarketcap_tool
-        ]
-        
-        # Session management
-        self.session_id = session_id
-        self.session = session_manager.get_or_create_session(session_id)
-        
-        # Create research chain
-        self.research_chain = self._create_research_chain()
+    Each call gets ``_TOOL_TIMEOUT`` seconds. Failed or timed-out calls are
+    logged and dropped; dict results are returned in call order.
+    """
+    if not calls:
+        return []
     
-    def _create_research_chain(self):
-        """Create optimized research chain using LCEL (LangChain Expression Language)"""
-        
-        # System prompt
-        system_prompt = """You are an expert Web3 research analyst with advanced data integration capabilities and conversation memory. You excel at merging information from multiple sources and creating comprehensive, professional research reports tailored to user-specific requests, while maintaining context from previous conversations.
+    logger.info(f"Executing {len(calls)} tasks in parallel")
+    results = await asyncio.gather(
+        *(asyncio.wait_for(call, _TOOL_TIMEOUT) for call in calls),
+        return_exceptions=True
+    )
+    
+    # Process results and log outcomes
+    valid_results = []
+    for i, result in enumerate(results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.error(f"Tool {i+1} timed out after {_TOOL_TIMEOUT:.0f}s")
+        elif isinstance(result, Exception):
+            logger.error(f"Tool {i+1} failed with exception: {result}")
+        else:
+            if isinstance(result, dict):
+                if result.get("success"):
+                    logger.info(f"Tool {i+1} succeeded: {result.get('source', 'unknown')}")
+                else:
+                    logger.warning(f"Tool {i+1} failed: {result.get('error', 'unknown error')}")
+                valid_results.append(result)
+    
+    return valid_results
+
+# merged_data record keys and type tags shared by the merge, scoring and
+# canonical-selection steps
+_KEY_DEX_TRADING = "dex_trading"
+_KEY_GLOBAL_METRICS = "global_metrics"
+_KEY_WALLET_BALANCE = "wallet_balance"
+_KEY_TRANSACTIONS = "transactions"
+_KEY_BLOCKCHAIN_ANALYTICS = "blockchain_analytics"
+_TYPE_MARKET_DATA = "market_data"
+_TYPE_CRYPTOCURRENCY_INFO = "cryptocurrency_info"
+
+# market_data record schema, in output order: (record key, CMC field) pairs read
+# from the coin itself and from its USD quote
+_MARKET_COIN_FIELDS: Tuple[Tuple[str, str], ...] = (("cmc_id", "id"), ("rank", "cmc_rank"))
+_MARKET_QUOTE_FIELDS: Tuple[Tuple[str, str], ...] = tuple(
+    (field, field) for field in ("price", "market_cap", "volume_24h", "percent_change_24h", "percent_change_7d")
+)
+_MARKET_SUPPLY_FIELDS: Tuple[Tuple[str, str], ...] = tuple(
+    (field, field) for field in ("circulating_supply", "total_supply", "max_supply")
+)
+
+
+def _market_entry(crypto: Dict[str, Any], symbol: str, source: str) -> Dict[str, Any]:
+    """primary_data record for one CMC quotes/listings coin; a missing or null quote leaves its fields None."""
+    quote = crypto.get("quote")
+    quote_usd = quote.get("USD") if isinstance(quote, dict) else None
+    if not isinstance(quote_usd, dict):
+        quote_usd = {}
+    entry = {"type": _TYPE_MARKET_DATA, "name": crypto.get("name"), "symbol": symbol}
+    for fields, record in ((_MARKET_COIN_FIELDS, crypto), (_MARKET_QUOTE_FIELDS, quote_usd), (_MARKET_SUPPLY_FIELDS, crypto)):
+        for key, field in fields:
+            entry[key] = record.get(field)
+    entry["source"] = source
+    return entry
+
+# Figures embedded in CMC /info descriptions, e.g. "The last known price of
+# Ethereum is 3,821.79158298 USD and is up 4.49 over the last 24 hours"
+# One zero-width alternation reports every figure in a single scan without
+# one match hiding another; Match.lastgroup names the figure found
+_CMC_DESCRIPTION_RE = re.compile(
+    r'(?=last known price of .+ is (?P<price>[\d,]+\.[\d]+) USD'
+    r'|and is up (?P<up>[\d\.]+)'
+    r'|and is down (?P<down>[\d\.]+)'
+    r'|current supply of (?P<supply>[\d,]+\.[\d]+))'
+)
+
+
+def _parse_cmc_description(description: str) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+    """(price, 24h percent change, supply) from a CMC /info description, None where absent.
+    
+    The first occurrence of each figure is used; a rise takes precedence over a fall.
+    """
+    figures: Dict[str, str] = {}
+    for match in _CMC_DESCRIPTION_RE.finditer(description):
+        figures.setdefault(match.lastgroup, match[match.lastgroup])
+    price = figures.get("price")
+    supply = figures.get("supply")
+    if "up" in figures:
+        change = float(figures["up"])
+    elif "down" in figures:
+        change = -float(figures["down"])
+    else:
+        change = None
+    return (
+        float(price.replace(',', '')) if price else None,
+        change,
+        float(supply.replace(',', '')) if supply else None,
+    )
+
+# Research synthesis prompt; immutable, so it is parsed and validated once at import
+_SYSTEM_PROMPT = """You are an expert Web3 research analyst with advanced data integration capabilities and conversation memory. You excel at merging information from multiple sources and creating comprehensive, professional research reports tailored to user-specific requests, while maintaining context from previous conversations.
 
 CORE RESPONSIBILITIES:
 1. **User-Centric Analysis**: Analyze and respond EXACTLY according to what the user asks and specifies
@@ -1846,16 +2508,101 @@ USER QUERY ADAPTATION:
 - If user asks for comparison, structure response as comparative analysis
 - Always prioritize answering the user's exact question before providing additional context"""
 
-        # Create prompt template
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            ("human", "Query: {query}\nAddress: {address}\nTime Range: {time_range}\nData Sources: {data_sources}\n\nCONTEXT AND ANALYSIS:\n{synthesis_context}")
-        ])
+_RESEARCH_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", _SYSTEM_PROMPT),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("human", "Query: {query}\nAddress: {address}\nTime Range: {time_range}\nData Sources: {data_sources}\n\nCONTEXT AND ANALYSIS:\n{synthesis_context}")
+])
+
+@lru_cache(maxsize=4)
+def _get_llm(model: str, temperature: float, max_tokens: int) -> ChatGoogleGenerativeAI:
+    """Shared Gemini client per configuration; conversation state lives in session_manager, not here."""
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=GEMINI_API_KEY,
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+
+# Query intents in priority order: the first intent with a matching keyword wins
+_QUERY_INTENTS: Tuple[Tuple[str, str, tuple], ...] = (
+    ("analysis", "analytical_report", ("analyze", "analysis", "performance", "how is", "doing")),
+    ("information", "informational_overview", ("info about", "information about", "what is", "tell me about", "details about")),
+    ("market_data", "market_report", ("price", "trading", "volume", "market", "trends")),
+    ("comparison", "comparative_analysis", ("compare", "vs", "versus", "difference")),
+    ("technical", "technical_report", ("dex", "whale", "technical", "data")),
+)
+_INTENT_CLASSIFIER = _KeywordClassifier({intent: keywords for intent, _, keywords in _QUERY_INTENTS})
+
+# Keyword groups that steer tool selection in _plan_research
+_PLAN_CLASSIFIER = _KeywordClassifier({
+    "dune": ("bitcoin", "btc", "ethereum", "eth", "analysis", "investment", "trading", "volume", "dex", "swap", "whale", "performance", "trend"),
+    "defillama": ("tvl", "protocol", "defi", "stablecoin", "apy", "yield", "fees", "revenue", "bridge"),
+    "etherscan": ("bitcoin", "btc", "ethereum", "eth", "analysis", "investment", "transaction", "network", "activity"),
+    "sample_address": ("bitcoin", "btc", "ethereum", "eth", "analysis", "investment"),
+    "investment": ("invest", "investment", "analysis", "should i", "good idea", "recommend"),
+})
+
+
+def _detect_query_intent(query: str) -> Tuple[str, str]:
+    """Return (intent, format preference) for a query in one keyword scan"""
+    matched = _INTENT_CLASSIFIER.classify(query)
+    for intent, format_preference, _ in _QUERY_INTENTS:
+        if intent in matched:
+            return intent, format_preference
+    return "general", "standard"
+
+
+# Result headers per query intent, emoji and title prefix prebuilt
+_INTENT_HEADERS: Mapping[str, str] = MappingProxyType({
+    "analysis": "🧪 **COMPREHENSIVE ANALYSIS** ",
+    "information": "ℹ️ **CRYPTOCURRENCY INFORMATION** ",
+    "market_data": "📈 **MARKET ANALYSIS** ",
+    "technical": "🔧 **TECHNICAL DATA ANALYSIS** ",
+    "comparison": "⚖️ **COMPARATIVE ANALYSIS** ",
+})
+_DEFAULT_INTENT_HEADER = "🔍 **RESEARCH RESULTS** "
+
+
+# Modern LangChain Research Chain
+class OptimizedWeb3ResearchAgent:
+    """Optimized Web3 research agent using modern LangChain patterns with session-based memory"""
+    
+    def __init__(self, session_id: str = None):
+        self.llm = _get_llm("gemini-2.0-flash", 0.1, 4000)
+        
+        # Available tools (commented out defillama since API key not provided)
+        self.tools = [
+            dune_analytics_tool,
+            etherscan_tool,
+            defillama_tool,
+            coinmarketcap_tool
+        ]
+        
+        # Default session; research() resolves the session per request so one
+        # agent instance can be shared across concurrent requests
+        self.session = session_manager.get_or_create_session(session_id)
+        self.session_id = self.session["id"]
+        
+        # Create research chain
+        self.research_chain = self._create_research_chain()
+        
+        # _merge_tool_data handlers by result source; all share one signature
+        self._merge_handlers = {
+            "coinmarketcap": self._merge_coinmarketcap_data,
+            "coinmarketcap_info": self._merge_coinmarketcap_data,
+            "dune_analytics": self._merge_dune_data,
+            "dune_analytics_sql": self._merge_dune_data,
+            "etherscan": self._merge_etherscan_data,
+            "defillama": self._merge_defillama_data,
+        }
+    
+    def _create_research_chain(self):
+        """Create optimized research chain using LCEL (LangChain Expression Language)"""
         
         # Tool selection chain
         tool_selector = (
-            prompt
+            _RESEARCH_PROMPT
             | self.llm
             | StrOutputParser()
         )
@@ -1875,112 +2622,96 @@ USER QUERY ADAPTATION:
             }
         }
         
+        sources_used = merged_data["metadata"]["sources_used"]
+        merge_handlers = self._merge_handlers
+        
         # Analyze and merge data from each tool
         for result in tool_results:
-            if not isinstance(result, dict):
-                continue
             if not result.get("success"):
                 continue
                 
             source = result.get("source", "unknown")
             data = result.get("data", {})
-            merged_data["metadata"]["sources_used"].append(source)
-            
-            # Merge CoinMarketCap data
-            if source in ["coinmarketcap", "coinmarketcap_info"]:
-                self._merge_coinmarketcap_data(merged_data, data, source, query_intent)
-            
-            # Merge Dune Analytics data
-            elif source in ["dune_analytics", "dune_analytics_sql"]:
-                self._merge_dune_data(merged_data, data, source, query_intent)
-            
-            # Merge Etherscan data
-            elif source == "etherscan":
-                self._merge_etherscan_data(merged_data, data, source, query_intent)
-
-            # Merge DefiLlama data
-            elif source == "defillama":
-                supplementary_data = merged_data.setdefault("supplementary_data", {})
-                # Aggregate bundle decomposition (tvl, stablecoins, dex, fees, yields, bridges)
-                if isinstance(data, dict) and data.get("aggregate"):
-                    tvl_section = data.get("tvl")
-                    if isinstance(tvl_section, dict):
-                        supplementary_data["defillama_tvl"] = tvl_section
-                    stablecoins_section = data.get("stablecoins")
-                    if isinstance(stablecoins_section, dict):
-                        supplementary_data["defillama_stablecoins"] = stablecoins_section
-                    dex_section = data.get("dex")
-                    if isinstance(dex_section, dict):
-                        supplementary_data["defillama_dex"] = dex_section
-                    fees_section = data.get("fees")
-                    if isinstance(fees_section, dict):
-                        supplementary_data["defillama_fees"] = fees_section
-                    yields_section = data.get("yields")
-                    if isinstance(yields_section, dict):
-                        supplementary_data["defillama_yields"] = yields_section
-                    bridges_section = data.get("bridges")
-                    if isinstance(bridges_section, dict):
-                        supplementary_data["defillama_bridges"] = bridges_section
-                    # Done handling aggregate; skip remaining heuristics
-                    continue
-                # Recognize stablecoins-like overview structures
-                if isinstance(data, dict) and ("peggedAssets" in data or "chains" in data):
-                    supplementary_data["stablecoins_overview"] = {
-                        "type": "stablecoins_overview",
-                        "pegged_assets_count": len(data.get("peggedAssets", [])) if isinstance(data.get("peggedAssets"), list) else 0,
-                        "chains_count": len(data.get("chains", [])) if isinstance(data.get("chains"), list) else 0,
-                        "sample_assets": data.get("peggedAssets", [])[:5],
-                        "sample_chains": data.get("chains", [])[:5],
-                    }
-                # Recognize DEX/fees overview
-                elif isinstance(data, dict) and ("protocols" in data or "totalDataChart" in data):
-                    supplementary_data["defi_overview"] = {
-                        "type": "defi_overview",
-                        "protocols_count": len(data.get("protocols", [])) if isinstance(data.get("protocols"), list) else 0,
-                        "sample_protocols": data.get("protocols", [])[:5],
-                    }
-                # Recognize bridges
-                elif isinstance(data, dict) and "bridges" in data:
-                    supplementary_data["bridges_overview"] = {
-                        "type": "bridges_overview",
-                        "bridges_count": len(data.get("bridges", [])) if isinstance(data.get("bridges"), list) else 0,
-                        "sample_bridges": data.get("bridges", [])[:5],
-                    }
-                else:
-                    # Fallbacks: wrap lists so downstream formatters can safely access via .get
-                    result_metadata = {}
-                    if isinstance(result, dict):
-                        result_metadata = result.get("metadata", {}) or {}
-                    endpoint_hint = result_metadata.get("endpoint", "defillama_data")
-
-                    if isinstance(data, list):
-                        key = endpoint_hint or "defillama_list"
-                        supplementary_data[key] = {
-                            "type": "defillama_list",
-                            "endpoint": endpoint_hint,
-                            "chain": result_metadata.get("chain"),
-                            "count": len(data),
-                            "items": data[:50],  # limit to avoid verbosity
-                        }
-                    elif isinstance(data, dict):
-                        key = endpoint_hint or "defillama_data"
-                        # ensure it has a type for safer formatting downstream
-                        if "type" not in data:
-                            data["type"] = "defillama_data"
-                        supplementary_data[key] = data
-                    else:
-                        supplementary_data["defillama"] = {
-                            "type": "defillama_data",
-                            "endpoint": endpoint_hint,
-                            "value": data,
-                        }
+            sources_used.append(source)
+            
+            handler = merge_handlers.get(source)
+            if handler is not None:
+                handler(merged_data, data, source, query_intent, result.get("metadata"))
         
         # Calculate completeness score
         merged_data["metadata"]["completeness_score"] = self._calculate_completeness_score(merged_data, query_intent)
         
         return merged_data
     
-    def _merge_coinmarketcap_data(self, merged_data: Dict, data: Dict, source: str, query_intent: str):
+    def _merge_defillama_data(self, merged_data: Dict, data: Any, source: str, query_intent: str, metadata: Optional[Dict] = None):
+        """Merge DefiLlama data into the unified data structure"""
+        supplementary_data = merged_data.setdefault("supplementary_data", {})
+        if isinstance(data, dict):
+            # Aggregate bundle decomposition (tvl, stablecoins, dex, fees, yields, bridges)
+            if data.get("aggregate"):
+                for section in _DEFILLAMA_SECTIONS:
+                    section_summary = data.get(section)
+                    if isinstance(section_summary, dict):
+                        supplementary_data[f"defillama_{section}"] = section_summary
+                return
+            # Recognize stablecoins-like overview structures
+            if "peggedAssets" in data or "chains" in data:
+                pegged_assets = data.get("peggedAssets", [])
+                chains = data.get("chains", [])
+                supplementary_data["stablecoins_overview"] = {
+                    "type": "stablecoins_overview",
+                    "pegged_assets_count": len(pegged_assets) if isinstance(pegged_assets, list) else 0,
+                    "chains_count": len(chains) if isinstance(chains, list) else 0,
+                    "sample_assets": pegged_assets[:5],
+                    "sample_chains": chains[:5],
+                }
+                return
+            # Recognize DEX/fees overview
+            if "protocols" in data or "totalDataChart" in data:
+                protocols = data.get("protocols", [])
+                supplementary_data["defi_overview"] = {
+                    "type": "defi_overview",
+                    "protocols_count": len(protocols) if isinstance(protocols, list) else 0,
+                    "sample_protocols": protocols[:5],
+                }
+                return
+            # Recognize bridges
+            if "bridges" in data:
+                bridges = data["bridges"]
+                supplementary_data["bridges_overview"] = {
+                    "type": "bridges_overview",
+                    "bridges_count": len(bridges) if isinstance(bridges, list) else 0,
+                    "sample_bridges": bridges[:5],
+                }
+                return
+
+        # Fallbacks: wrap lists so downstream formatters can safely access via .get
+        metadata = metadata or {}
+        endpoint_hint = metadata.get("endpoint", "defillama_data")
+
+        if isinstance(data, list):
+            key = endpoint_hint or "defillama_list"
+            supplementary_data[key] = {
+                "type": "defillama_list",
+                "endpoint": endpoint_hint,
+                "chain": metadata.get("chain"),
+                "count": len(data),
+                "items": data[:50],  # limit to avoid verbosity
+            }
+        elif isinstance(data, dict):
+            key = endpoint_hint or "defillama_data"
+            # ensure it has a type for safer formatting downstream
+            if "type" not in data:
+                data["type"] = "defillama_data"
+            supplementary_data[key] = data
+        else:
+            supplementary_data["defillama"] = {
+                "type": "defillama_data",
+                "endpoint": endpoint_hint,
+                "value": data,
+            }
+    
+    def _merge_coinmarketcap_data(self, merged_data: Dict, data: Dict, source: str, query_intent: str, metadata: Optional[Dict] = None):
         """Merge CoinMarketCap data into the unified data structure"""
         if not isinstance(data, dict):
             return
@@ -1992,25 +2723,7 @@ USER QUERY ADAPTATION:
                 
                 # Extract price data from the description if available
                 description = crypto_info.get("description", "")
-                current_price = None
-                percent_change_24h = None
-                current_supply = None
-                
-                # Parse price from description like "The last known price of Ethereum is 3,821.79158298 USD and is up 4.49"
-                price_match = re.search(r'last known price of .+ is ([\d,]+\.[\d]+) USD', description)
-                if price_match:
-                    current_price = float(price_match.group(1).replace(',', ''))
-                
-                change_match = re.search(r'and is up ([\d\.]+)', description)
-                if change_match:
-                    percent_change_24h = float(change_match.group(1))
-                elif re.search(r'and is down ([\d\.]+)', description):
-                    down_match = re.search(r'and is down ([\d\.]+)', description)
-                    percent_change_24h = -float(down_match.group(1))
-                
-                supply_match = re.search(r'current supply of ([\d,]+\.[\d]+)', description)
-                if supply_match:
-                    current_supply = float(supply_match.group(1).replace(',', ''))
+                current_price, percent_change_24h, current_supply = _parse_cmc_description(description)
                 
                 # Also check if there's market cap data or additional quote information embedded
                 market_cap = None
@@ -2038,7 +2751,7 @@ USER QUERY ADAPTATION:
                     max_supply = crypto_info['max_supply']
                 
                 merged_data["primary_data"][crypto_key] = {
-                    "type": "cryptocurrency_info",
+                    "type": _TYPE_CRYPTOCURRENCY_INFO,
                     "name": crypto_info.get("name"),
                     "symbol": crypto_info.get("symbol"),
                     "description": crypto_info.get("description"),
@@ -2064,7 +2777,8 @@ USER QUERY ADAPTATION:
         # Handle market data
         elif "data" in data:
             market_data = data["data"]
-            # If this is quotes/latest for a specific symbol, data is dict keyed by symbol or id
+            # If this is quotes/latest for a specific symbol, data is dict keyed by symbol or id;
+            # any() stops at the first quote record, which for CMC payloads is the first value
             if isinstance(market_data, dict) and any(isinstance(v, dict) and "quote" in v for v in market_data.values()):
                 for key, crypto in market_data.items():
                     if not isinstance(crypto, dict):
@@ -2072,93 +2786,74 @@ USER QUERY ADAPTATION:
                     symbol = crypto.get("symbol") or key
                     if not symbol:
                         symbol = str(key)
-                    merged_data["primary_data"][f"market_{symbol}"] = {
-                        "type": "market_data",
-                        "name": crypto.get("name"),
-                        "symbol": symbol,
-                        "cmc_id": crypto.get("id"),
-                        "rank": crypto.get("cmc_rank"),
-                        "price": crypto.get("quote", {}).get("USD", {}).get("price"),
-                        "market_cap": crypto.get("quote", {}).get("USD", {}).get("market_cap"),
-                        "volume_24h": crypto.get("quote", {}).get("USD", {}).get("volume_24h"),
-                        "percent_change_24h": crypto.get("quote", {}).get("USD", {}).get("percent_change_24h"),
-                        "percent_change_7d": crypto.get("quote", {}).get("USD", {}).get("percent_change_7d"),
-                        "circulating_supply": crypto.get("circulating_supply"),
-                        "total_supply": crypto.get("total_supply"),
-                        "max_supply": crypto.get("max_supply"),
-                        "source": source
-                    }
+                    merged_data["primary_data"][f"market_{symbol}"] = _market_entry(crypto, symbol, source)
             # Listings/latest returns a list
             elif isinstance(market_data, list):
                 for crypto in market_data:
                     if not isinstance(crypto, dict):
                         continue
                     symbol = crypto.get("symbol", "UNKNOWN")
-                    merged_data["primary_data"][f"market_{symbol}"] = {
-                        "type": "market_data",
-                        "name": crypto.get("name"),
-                        "symbol": symbol,
-                        "cmc_id": crypto.get("id"),
-                        "rank": crypto.get("cmc_rank"),
-                        "price": crypto.get("quote", {}).get("USD", {}).get("price"),
-                        "market_cap": crypto.get("quote", {}).get("USD", {}).get("market_cap"),
-                        "volume_24h": crypto.get("quote", {}).get("USD", {}).get("volume_24h"),
-                        "percent_change_24h": crypto.get("quote", {}).get("USD", {}).get("percent_change_24h"),
-                        "percent_change_7d": crypto.get("quote", {}).get("USD", {}).get("percent_change_7d"),
-                        "circulating_supply": crypto.get("circulating_supply"),
-                        "total_supply": crypto.get("total_supply"),
-                        "max_supply": crypto.get("max_supply"),
-                        "source": source
-                    }
+                    merged_data["primary_data"][f"market_{symbol}"] = _market_entry(crypto, symbol, source)
             # Global metrics format
             elif isinstance(market_data, dict) and "quote" in market_data:
-                merged_data["supplementary_data"]["global_metrics"] = {
+                quote_usd = market_data.get("quote", {}).get("USD", {})
+                merged_data["supplementary_data"][_KEY_GLOBAL_METRICS] = {
                     "type": "global_metrics",
-                    "total_market_cap": market_data.get("quote", {}).get("USD", {}).get("total_market_cap"),
-                    "total_volume_24h": market_data.get("quote", {}).get("USD", {}).get("total_volume_24h"),
+                    "total_market_cap": quote_usd.get("total_market_cap"),
+                    "total_volume_24h": quote_usd.get("total_volume_24h"),
                     "bitcoin_dominance": market_data.get("btc_dominance"),
                     "active_cryptocurrencies": market_data.get("active_cryptocurrencies"),
                     "source": source
                 }
     
-    def _merge_dune_data(self, merged_data: Dict, data: Any, source: str, query_intent: str):
+    def _merge_dune_data(self, merged_data: Dict, data: Any, source: str, query_intent: str, metadata: Optional[Dict] = None):
         """Merge Dune Analytics data into the unified data structure"""
         if isinstance(data, list) and data:
             # Check if this is DEX pairs data - updated to match actual API response structure
             if data and isinstance(data[0], dict) and any(key in data[0] for key in ["token_pair", "pair_address", "one_day_volume", "seven_day_volume"]):
-                merged_data["primary_data"]["dex_trading"] = {
+                # All three totals in one pass; rows that aren't dicts or lack a figure count as 0
+                volume_24h = volume_7d = liquidity = 0
+                for pair in data:
+                    if not isinstance(pair, dict):
+                        continue
+                    volume_24h += pair.get("one_day_volume") or 0
+                    volume_7d += pair.get("seven_day_volume") or 0
+                    liquidity += pair.get("usd_liquidity") or 0
+                merged_data["primary_data"][_KEY_DEX_TRADING] = {
                     "type": "dex_data",
-                    "pairs": data,
+                    "pairs": data[:_DUNE_MAX_STORED_PAIRS],
                     "total_pairs": len(data),
-                    "total_24h_volume": sum(pair.get("one_day_volume", 0) for pair in data),
-                    "total_7d_volume": sum(pair.get("seven_day_volume", 0) for pair in data),
-                    "total_liquidity": sum(pair.get("usd_liquidity", 0) for pair in data),
+                    "total_24h_volume": volume_24h,
+                    "total_7d_volume": volume_7d,
+                    "total_liquidity": liquidity,
                     "top_pairs": data[:5],  # Top 5 pairs for summary
                     "source": source
                 }
             else:
                 # General analytics data
-                merged_data["supplementary_data"]["blockchain_analytics"] = {
+                merged_data["supplementary_data"][_KEY_BLOCKCHAIN_ANALYTICS] = {
                     "type": "analytics_data",
                     "data": data,
                     "source": source
                 }
     
-    def _merge_etherscan_data(self, merged_data: Dict, data: Dict, source: str, query_intent: str):
+    def _merge_etherscan_data(self, merged_data: Dict, data: Dict, source: str, query_intent: str, metadata: Optional[Dict] = None):
         """Merge Etherscan data into the unified data structure"""
         if isinstance(data, dict) and "result" in data:
             result = data["result"]
             if isinstance(result, str) and result.isdigit():
-                # Balance data
-                merged_data["supplementary_data"]["wallet_balance"] = {
+                # Balance data; the float is for display, the string keeps every wei
+                wei = int(result)
+                merged_data["supplementary_data"][_KEY_WALLET_BALANCE] = {
                     "type": "wallet_balance",
                     "balance_wei": result,
-                    "balance_eth": int(result) / 10**18,
+                    "balance_eth": wei / _WEI_PER_ETH,
+                    "balance_eth_precise": str(Decimal(wei) / _WEI_PER_ETH_DEC),
                     "source": source
                 }
             elif isinstance(result, list) and result:
                 # Transaction data
-                merged_data["supplementary_data"]["transactions"] = {
+                merged_data["supplementary_data"][_KEY_TRANSACTIONS] = {
                     "type": "transaction_data",
                     "transactions": result[:10],  # Limit to recent 10
                     "total_count": len(result),
@@ -2176,16 +2871,27 @@ USER QUERY ADAPTATION:
         
         # Primary data type scoring (more weight)
         primary_data = merged_data.get("primary_data", {})
-        has_crypto_info = any("cryptocurrency_info" in str(v) for v in primary_data.values())
-        has_market_data = any("market_data" in str(v) for v in primary_data.values())
-        has_dex_data = "dex_trading" in primary_data  # Fixed: direct check for dex_trading key
+        # Read each record's type tag instead of rendering whole records with str(),
+        # stopping once both kinds have been seen; technical scoring uses neither
+        has_crypto_info = has_market_data = False
+        for record in (primary_data.values() if query_intent != "technical" else ()):
+            if not isinstance(record, dict):
+                continue
+            record_type = record.get("type")
+            if record_type == _TYPE_CRYPTOCURRENCY_INFO:
+                has_crypto_info = True
+            elif record_type == _TYPE_MARKET_DATA:
+                has_market_data = True
+            if has_crypto_info and has_market_data:
+                break
+        has_dex_data = _KEY_DEX_TRADING in primary_data  # Fixed: direct check for dex_trading key
         
         # Supplementary data scoring
         supplementary_data = merged_data.get("supplementary_data", {})
-        has_global_metrics = "global_metrics" in supplementary_data
-        has_wallet_data = "wallet_balance" in supplementary_data
-        has_transaction_data = "transactions" in supplementary_data
-        has_blockchain_analytics = "blockchain_analytics" in supplementary_data
+        has_global_metrics = _KEY_GLOBAL_METRICS in supplementary_data
+        has_wallet_data = _KEY_WALLET_BALANCE in supplementary_data
+        has_transaction_data = _KEY_TRANSACTIONS in supplementary_data
+        has_blockchain_analytics = _KEY_BLOCKCHAIN_ANALYTICS in supplementary_data
         
         # Intent-specific scoring with higher thresholds
         if query_intent == "information":
@@ -2251,6 +2957,10 @@ USER QUERY ADAPTATION:
             if has_blockchain_analytics:
                 score += 10.0
         
+        # Remaining bonuses only add to the score, so stop once it is saturated
+        if score >= max_score:
+            return max_score
+        
         # Source diversity bonus (higher reward)
         sources = set(merged_data.get("metadata", {}).get("sources_used", []))
         source_count = len(sources)
@@ -2260,6 +2970,8 @@ USER QUERY ADAPTATION:
             score += 10.0
         elif source_count == 1:
             score += 5.0
+        if score >= max_score:
+            return max_score
         
         # Data richness bonus
         total_data_points = len(primary_data) + len(supplementary_data)
@@ -2301,19 +3013,22 @@ USER QUERY ADAPTATION:
             canonical["bridges"] = {"source": "defillama", "data": supplementary["defillama_bridges"]}
 
         # CoinMarketCap market data (choose first market_data)
-        market_items = [v for v in primary.values() if isinstance(v, dict) and v.get("type") == "market_data"]
-        if market_items:
-            canonical["market"] = {"source": "coinmarketcap", "data": market_items[0]}
+        market_first = next(
+            (v for v in primary.values() if isinstance(v, dict) and v.get("type") == _TYPE_MARKET_DATA),
+            None
+        )
+        if market_first is not None:
+            canonical["market"] = {"source": "coinmarketcap", "data": market_first}
 
         # Dune DEX pairs/trading
-        if isinstance(primary.get("dex_trading"), dict):
-            canonical["dex_trading"] = {"source": "dune_analytics", "data": primary["dex_trading"]}
+        if isinstance(primary.get(_KEY_DEX_TRADING), dict):
+            canonical["dex_trading"] = {"source": "dune_analytics", "data": primary[_KEY_DEX_TRADING]}
 
         # Etherscan wallet and txs
-        if isinstance(supplementary.get("wallet_balance"), dict):
-            canonical["wallet_balance"] = {"source": "etherscan", "data": supplementary["wallet_balance"]}
-        if isinstance(supplementary.get("transactions"), dict):
-            canonical["transactions"] = {"source": "etherscan", "data": supplementary["transactions"]}
+        if isinstance(supplementary.get(_KEY_WALLET_BALANCE), dict):
+            canonical["wallet_balance"] = {"source": "etherscan", "data": supplementary[_KEY_WALLET_BALANCE]}
+        if isinstance(supplementary.get(_KEY_TRANSACTIONS), dict):
+            canonical["transactions"] = {"source": "etherscan", "data": supplementary[_KEY_TRANSACTIONS]}
 
         return canonical
     
@@ -2334,23 +3049,8 @@ USER QUERY ADAPTATION:
                 data_quality_emoji = "🔴"
         
         # Add formatting enhancements based on query type
-        if query_intent == "analysis":
-            formatted_result = f"� **COMPREHENSIVE ANALYSIS** {data_quality_emoji}\n\n{result}"
-            
-        elif query_intent == "information":
-            formatted_result = f"ℹ️ **CRYPTOCURRENCY INFORMATION** {data_quality_emoji}\n\n{result}"
-            
-        elif query_intent == "market_data":
-            formatted_result = f"📈 **MARKET ANALYSIS** {data_quality_emoji}\n\n{result}"
-            
-        elif query_intent == "technical":
-            formatted_result = f"🔧 **TECHNICAL DATA ANALYSIS** {data_quality_emoji}\n\n{result}"
-            
-        elif query_intent == "comparison":
-            formatted_result = f"⚖️ **COMPARATIVE ANALYSIS** {data_quality_emoji}\n\n{result}"
-            
-        else:
-            formatted_result = f"🔍 **RESEARCH RESULTS** {data_quality_emoji}\n\n{result}"
+        header = _INTENT_HEADERS.get(query_intent, _DEFAULT_INTENT_HEADER)
+        formatted_result = f"{header}{data_quality_emoji}\n\n{result}"
         
         # Add data quality footer if available
         if merged_data:
@@ -2367,116 +3067,118 @@ USER QUERY ADAPTATION:
         
         return formatted_result
 
+    @staticmethod
+    def _build_greeting_return(result: str, reasoning_step: str, start_time: datetime, session_id: str, response_type: str) -> Dict[str, Any]:
+        """Result payload shared by the greeting and greeting-fallback paths"""
+        return {
+            "success": True,
+            "result": result,
+            "reasoning_steps": [reasoning_step],
+            "citations": [],
+            "data_sources_used": [],
+            "execution_time": (datetime.now() - start_time).total_seconds(),
+            "query_intent": "greeting",
+            "session_id": session_id,
+            "completeness_score": 1.0,  # Greetings are always complete
+            "metadata": {
+                "is_greeting": True,
+                "api_calls_made": 0,
+                "sources_used": [],
+                "response_type": response_type
+            }
+        }
+    
+    async def respond_to_greeting(self, query: str, session_id: str, start_time: datetime = None) -> Dict[str, Any]:
+        """Answer a greeting from canned replies without touching LLM or data APIs"""
+        start_time = start_time or datetime.now()
+        try:
+            session = session_manager.get_or_create_session(session_id)
+            
+            # Generate greeting response personalized from the session
+            greeting_response = get_greeting_response(query, session)
+            
+            # Update session chat history for greetings too
+            chat_history = session["chat_history"]
+            async with session["lock"]:
+                chat_history.add_user_message(query)
+                chat_history.add_ai_message(greeting_response)
+                
+                # Update session context
+                session["message_count"] = len(chat_history.messages)
+            session_manager.update_session_context(session_id, {
+                "last_query": query,
+                "last_result": greeting_response,
+                "query_intent": "greeting",
+                "data_sources": []
+            })
+            
+            return self._build_greeting_return(
+                greeting_response,
+                "Detected greeting message - provided friendly AI response",
+                start_time, session_id, "greeting"
+            )
+            
+        except Exception as e:
+            logger.error(f"Error handling greeting: {str(e)}")
+            # Fallback to a simple greeting if there's an error
+            return self._build_greeting_return(
+                "Hello! 👋 I'm your Web3 Research Assistant. How can I help you today?",
+                "Greeting detected - provided fallback response",
+                start_time, session_id, "greeting_fallback"
+            )
+    
     async def research(self, request: ResearchRequest) -> Dict[str, Any]:
         """Execute research using optimized chain with intelligent formatting"""
+        result = None
+        async for event in self.research_stream(request):
+            if event["event"] == "result":
+                result = event["data"]
+        return result
+    
+    async def research_stream(self, request: ResearchRequest) -> AsyncIterator[Dict[str, Any]]:
+        """Execute research, yielding progress events as each phase completes.
+        
+        Yields ``{"event": "step", "message": ...}`` for every reasoning step and
+        finishes with ``{"event": "result", "data": ...}`` holding the same payload
+        that research() returns.
+        """
         start_time = datetime.now()
         reasoning_steps = []
+        
+        def step(message: str) -> Dict[str, Any]:
+            reasoning_steps.append(message)
+            return {"event": "step", "message": message}
         citations = []
         data_sources_used = []
         
+        # Resolve the session for this request without mutating shared agent state
+        session_id = request.session_id or self.session_id
+        
         # Check if this is a greeting first (bypass API analysis for greetings)
         if detect_greeting(request.query):
-            try:
-                # Update session ID if provided in request
-                if request.session_id and request.session_id != self.session_id:
-                    self.session_id = request.session_id
-                    self.session = session_manager.get_or_create_session(request.session_id)
-                
-                # Get session context for personalized greeting
-                session_context = self.session
-                
-                # Generate greeting response
-                greeting_response = get_greeting_response(request.query, session_context)
-                
-                # Update session chat history for greetings too
-                chat_history = self.session["chat_history"]
-                chat_history.add_user_message(request.query)
-                chat_history.add_ai_message(greeting_response)
-                
-                # Update session context
-                self.session["message_count"] = len(chat_history.messages)
-                session_manager.update_session_context(self.session_id, {
-                    "last_query": request.query,
-                    "last_result": greeting_response,
-                    "query_intent": "greeting",
-                    "data_sources": []
-                })
-                
-                execution_time = (datetime.now() - start_time).total_seconds()
-                
-                return {
-                    "success": True,
-                    "result": greeting_response,
-                    "reasoning_steps": ["Detected greeting message - provided friendly AI response"],
-                    "citations": [],
-                    "data_sources_used": [],
-                    "execution_time": execution_time,
-                    "query_intent": "greeting",
-                    "session_id": self.session_id,
-                    "completeness_score": 1.0,  # Greetings are always complete
-                    "metadata": {
-                        "is_greeting": True,
-                        "api_calls_made": 0,
-                        "sources_used": [],
-                        "response_type": "greeting"
-                    }
-                }
-                
-            except Exception as e:
-                logger.error(f"Error handling greeting: {str(e)}")
-                # Fallback to a simple greeting if there's an error
-                return {
-                    "success": True,
-                    "result": "Hello! 👋 I'm your Web3 Research Assistant. How can I help you today?",
-                    "reasoning_steps": ["Greeting detected - provided fallback response"],
-                    "citations": [],
-                    "data_sources_used": [],
-                    "execution_time": (datetime.now() - start_time).total_seconds(),
-                    "query_intent": "greeting",
-                    "session_id": self.session_id,
-                    "completeness_score": 1.0,
-                    "metadata": {
-                        "is_greeting": True,
-                        "api_calls_made": 0,
-                        "sources_used": [],
-                        "response_type": "greeting_fallback"
-                    }
-                }
+            yield {"event": "result", "data": await self.respond_to_greeting(request.query, session_id, start_time)}
+            return
         
         # Analyze query intent early for better processing (non-greeting queries)
-        query_lower = request.query.lower()
-        query_intent = "general"
-        
-        if any(word in query_lower for word in ["analyze", "analysis", "performance", "how is", "doing"]):
-            query_intent = "analysis"
-        elif any(word in query_lower for word in ["info about", "information about", "what is", "tell me about", "details about"]):
-            query_intent = "information"
-        elif any(word in query_lower for word in ["price", "trading", "volume", "market", "trends"]):
-            query_intent = "market_data"
-        elif any(word in query_lower for word in ["compare", "vs", "versus", "difference"]):
-            query_intent = "comparison"
-        elif any(word in query_lower for word in ["dex", "whale", "technical", "data"]):
-            query_intent = "technical"
+        query_intent, _ = _detect_query_intent(request.query)
         
         try:
-            # Update session ID if provided in request
-            if request.session_id and request.session_id != self.session_id:
-                self.session_id = request.session_id
-                self.session = session_manager.get_or_create_session(request.session_id)
+            session = session_manager.get_or_create_session(session_id)
             
             # Get conversation history and context
-            chat_history = self.session["chat_history"]
-            conversation_summary = session_manager.get_conversation_summary(self.session_id)
+            chat_history = session["chat_history"]
+            conversation_summary = session_manager.get_conversation_summary(session_id)
             
             # Add current user message to chat history BEFORE processing
-            current_time = datetime.now().isoformat()
+            current_time = start_time.isoformat()
             user_msg = HumanMessage(content=request.query)
             user_msg.additional_kwargs = {"timestamp": current_time}
-            chat_history.add_message(user_msg)
+            async with session["lock"]:
+                chat_history.add_message(user_msg)
             
             # Add conversation context to reasoning
             if conversation_summary:
-                reasoning_steps.append(f"Referencing conversation history: {len(chat_history.messages)} previous messages")
+                yield step(f"Referencing conversation history: {len(chat_history.messages)} previous messages")
             
             # Prepare context with session memory (now includes current query)
             context = {
@@ -2487,34 +3189,36 @@ USER QUERY ADAPTATION:
                 "chat_history": chat_history.messages
             }
             
-            reasoning_steps.append(f"Analyzing query and planning approach (Intent: {query_intent})")
+            yield step(f"Analyzing query and planning approach (Intent: {query_intent})")
             
             # Execute research plan
             research_plan = await self._plan_research(request)
-            reasoning_steps.extend(research_plan["steps"])
+            for plan_step in research_plan["steps"]:
+                yield step(plan_step)
             
             # Execute tool calls in parallel where possible
+            # run_tools_batch only returns dict envelopes, so no re-filtering here
             tool_results = await self._execute_parallel_tools(request, research_plan["tools"])
-            # Guard against any non-dict tool results
-            tool_results = [r for r in tool_results if isinstance(r, dict)]
-            data_sources_used = [r.get("source", "unknown") for r in tool_results if isinstance(r, dict) and r.get("success")]
+            # De-duplicated once here; every payload below reuses this list
+            data_sources_used = list({r.get("source", "unknown") for r in tool_results if r.get("success")})
             
-            reasoning_steps.append("Merging and analyzing data from all sources")
+            yield step("Merging and analyzing data from all sources")
             
             # Merge all tool data intelligently
             merged_data = self._merge_tool_data(tool_results, query_intent)
+            merged_metadata = merged_data["metadata"]
             
-            reasoning_steps.append("Synthesizing comprehensive response based on merged data")
+            yield step("Synthesizing comprehensive response based on merged data")
             
             # Generate final response with enhanced context
-            synthesis_prompt = self._create_synthesis_prompt(request, tool_results, merged_data)
+            synthesis_prompt = self._create_synthesis_prompt(request, tool_results, merged_data, session_id=session_id)
             
             # Prepare enhanced context for final response
             enhanced_context = {
                 "query": request.query,
                 "address": request.address or "Not specified", 
                 "time_range": request.time_range,
-                "data_sources": ", ".join(merged_data.get("metadata", {}).get("sources_used", [])),
+                "data_sources": ", ".join(merged_metadata["sources_used"]),
                 "chat_history": chat_history.messages,
                 "synthesis_context": synthesis_prompt
             }
@@ -2524,62 +3228,68 @@ USER QUERY ADAPTATION:
             # Apply intelligent formatting based on query intent and data quality
             final_result = self._format_final_result(raw_result, query_intent, merged_data)
             
+            # One clock read for the reply timestamp, citations and execution time
+            end_time = datetime.now()
+            end_iso = end_time.isoformat()
+            
             # Add AI response to chat history with research data
             ai_msg = AIMessage(content=final_result)
             ai_msg.additional_kwargs = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": end_iso,
                 "research_data": {
                     "success": True,
                     "result": final_result,
                     "reasoning_steps": reasoning_steps,
                     "citations": citations,
-                    "data_sources_used": list(set(data_sources_used)),
+                    "data_sources_used": data_sources_used,
                     "query_intent": query_intent,
                     "merged_data": merged_data,
-                    "data_quality_score": merged_data.get("metadata", {}).get("completeness_score", 0)
+                    "data_quality_score": merged_metadata["completeness_score"]
                 }
             }
-            chat_history.add_message(ai_msg)
-            
-            # Update session context
-            self.session["message_count"] = len(chat_history.messages)
-            session_manager.update_session_context(self.session_id, {
+            async with session["lock"]:
+                chat_history.add_message(ai_msg)
+                
+                # Update session context
+                session["message_count"] = len(chat_history.messages)
+            session_manager.update_session_context(session_id, {
                 "last_query": request.query,
                 "last_result": final_result,
                 "query_intent": query_intent,
                 "data_sources": data_sources_used
             })
             
-            # Create citations
+            # Create citations; every entry shares the same timestamp and query context
+            query_context = request.query[:100]
             citations = [
                 {
                     "source": source,
-                    "timestamp": datetime.now().isoformat(),
-                    "query_context": request.query[:100]
+                    "timestamp": end_iso,
+                    "query_context": query_context
                 }
-                for source in set(data_sources_used)
+                for source in data_sources_used
             ]
             
-            execution_time = (datetime.now() - start_time).total_seconds()
+            execution_time = (end_time - start_time).total_seconds()
             
-            return {
+            yield {"event": "result", "data": {
                 "success": True,
                 "result": final_result,
                 "reasoning_steps": reasoning_steps,
                 "citations": citations,
-                "data_sources_used": list(set(data_sources_used)),
+                "data_sources_used": data_sources_used,
                 "execution_time": execution_time,
                 "query_intent": query_intent,
                 "merged_data": merged_data,  # Include merged data in results
-                "data_quality_score": merged_data.get("metadata", {}).get("completeness_score", 0),
+                "data_quality_score": merged_metadata["completeness_score"],
                 "tool_results": tool_results  # For debugging
-            }
+            }}
             
         except Exception as e:
             logger.error(f"Research execution error: {e}")
             execution_time = (datetime.now() - start_time).total_seconds()
             
-            return {
+            yield {"event": "result", "data": {
                 "success": False,
                 "error": str(e),
                 "reasoning_steps": reasoning_steps,
@@ -2587,11 +3297,11 @@ USER QUERY ADAPTATION:
                 "data_sources_used": data_sources_used,
                 "execution_time": execution_time,
                 "query_intent": query_intent
-            }
+            }}
     
     async def _plan_research(self, request: ResearchRequest) -> Dict[str, Any]:
         """Plan which tools to use based on the query - Enhanced for maximum tool usage"""
-        query_lower = request.query.lower()
+        matched = _PLAN_CLASSIFIER.classify(request.query)
         tools_to_use = []
         steps = ["Query analysis completed"]
         
@@ -2601,23 +3311,21 @@ USER QUERY ADAPTATION:
         steps.append("Selected CoinMarketCap for market data and price analysis")
         
         # Use Dune Analytics for comprehensive blockchain analytics
-        if any(keyword in query_lower for keyword in ["bitcoin", "btc", "ethereum", "eth", "analysis", "investment", "trading", "volume", "dex", "swap", "whale", "performance", "trend"]):
+        if "dune" in matched:
             tools_to_use.append("dune_analytics_tool")
             steps.append("Selected Dune Analytics for blockchain metrics and trading data")
         
         # Use DefiLlama for TVL/yields/stablecoins when relevant
-        if any(keyword in query_lower for keyword in [
-            "tvl", "protocol", "defi", "stablecoin", "apy", "yield", "fees", "revenue", "bridge"
-        ]):
+        if "defillama" in matched:
             tools_to_use.append("defillama_tool")
             steps.append("Selected DefiLlama for TVL, yields, stablecoins, fees, bridges, prices")
 
         # Use Etherscan for on-chain data when analyzing major cryptocurrencies
-        if any(keyword in query_lower for keyword in ["bitcoin", "btc", "ethereum", "eth", "analysis", "investment", "transaction", "network", "activity"]) or request.address:
+        if "etherscan" in matched or request.address:
             # For comprehensive analysis, we'll use a sample Ethereum address to get transaction data
-            if not request.address and any(keyword in query_lower for keyword in ["bitcoin", "btc", "ethereum", "eth", "analysis", "investment"]):
+            if not request.address and "sample_address" in matched:
                 # Use a well-known address for demonstration (Ethereum Foundation)
-                request.address = "0xde0B295669a9FD93d5F28D9Ec85E40f4cb697BAe"
+                request.address = _SAMPLE_ETH_ADDRESS
                 steps.append("Using sample Ethereum address for on-chain analysis demonstration")
             
             if request.address:
@@ -2625,7 +3333,7 @@ USER QUERY ADAPTATION:
                 steps.append("Selected Etherscan for on-chain transaction analysis")
         
         # For investment/analysis queries, ensure we use multiple tools for comprehensive data
-        if any(keyword in query_lower for keyword in ["invest", "investment", "analysis", "should i", "good idea", "recommend"]):
+        if "investment" in matched:
             # Ensure all available tools are used for maximum data completeness
             if "dune_analytics_tool" not in tools_to_use:
                 tools_to_use.append("dune_analytics_tool")
@@ -2638,7 +3346,7 @@ USER QUERY ADAPTATION:
             # Use Etherscan with a sample address if not already included
             if "etherscan_tool" not in tools_to_use:
                 if not request.address:
-                    request.address = "0xde0B295669a9FD93d5F28D9Ec85E40f4cb697BAe"  # Ethereum Foundation
+                    request.address = _SAMPLE_ETH_ADDRESS
                 tools_to_use.append("etherscan_tool")
                 steps.append("Added Etherscan for blockchain network health analysis")
         
@@ -2691,52 +3399,13 @@ USER QUERY ADAPTATION:
             tasks.append(task)
         
         # Execute all tasks in parallel
-        if tasks:
-            logger.info(f"Executing {len(tasks)} tasks in parallel")
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process results and log outcomes
-            valid_results = []
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"Tool {i+1} failed with exception: {result}")
-                else:
-                    if isinstance(result, dict):
-                        if result.get("success"):
-                            logger.info(f"Tool {i+1} succeeded: {result.get('source', 'unknown')}")
-                        else:
-                            logger.warning(f"Tool {i+1} failed: {result.get('error', 'unknown error')}")
-                        valid_results.append(result)
-            
-            return valid_results
-        
-        return []
+        return await run_tools_batch(tasks)
     
-    def _create_synthesis_prompt(self, request: ResearchRequest, tool_results: List[Dict], merged_data: Dict = None) -> str:
+    def _create_synthesis_prompt(self, request: ResearchRequest, tool_results: List[Dict], merged_data: Dict = None, session_id: str = None) -> str:
         """Create context for final synthesis with query intent analysis and merged data"""
         
-        # Analyze query intent for better formatting
-        query_lower = request.query.lower()
-        
         # Determine query intent and preferred format
-        query_intent = "general"
-        format_preference = "standard"
-        
-        if any(word in query_lower for word in ["analyze", "analysis", "performance", "how is", "doing"]):
-            query_intent = "analysis"
-            format_preference = "analytical_report"
-        elif any(word in query_lower for word in ["info about", "information about", "what is", "tell me about", "details about"]):
-            query_intent = "information"
-            format_preference = "informational_overview"
-        elif any(word in query_lower for word in ["price", "trading", "volume", "market", "trends"]):
-            query_intent = "market_data"
-            format_preference = "market_report"
-        elif any(word in query_lower for word in ["compare", "vs", "versus", "difference"]):
-            query_intent = "comparison"
-            format_preference = "comparative_analysis"
-        elif any(word in query_lower for word in ["dex", "whale", "technical", "data"]):
-            query_intent = "technical"
-            format_preference = "technical_report"
+        query_intent, format_preference = _detect_query_intent(request.query)
         
         context_parts = [
             f"Original Query: {request.query}",
@@ -2746,7 +3415,7 @@ USER QUERY ADAPTATION:
         ]
         
         # Add conversation context if available
-        conversation_summary = session_manager.get_conversation_summary(self.session_id)
+        conversation_summary = session_manager.get_conversation_summary(session_id or self.session_id)
         if conversation_summary:
             context_parts.append("\n💬 === CONVERSATION HISTORY ===")
             context_parts.append("IMPORTANT: Reference and build upon the following previous conversation:")
@@ -2792,7 +3461,7 @@ USER QUERY ADAPTATION:
             # Extract and highlight CoinMarketCap data prominently
             primary_data = merged_data.get("primary_data", {})
             for key, data_item in primary_data.items():
-                if data_item.get("type") == "market_data":
+                if data_item.get("type") == _TYPE_MARKET_DATA:
                     name = data_item.get("name", "Unknown") 
                     symbol = data_item.get("symbol", "N/A")
                     price = data_item.get("price")
@@ -2820,7 +3489,7 @@ USER QUERY ADAPTATION:
                 requested_symbol = None
                 # Try to find symbol in tool metadata from coinmarketcap
                 for r in tool_results:
-                    if isinstance(r, dict) and r.get("source") == "coinmarketcap":
+                    if r.get("source") == "coinmarketcap":
                         requested_symbol = (r.get("metadata", {}) or {}).get("symbol")
                         if requested_symbol:
                             break
@@ -2829,7 +3498,7 @@ USER QUERY ADAPTATION:
                     ordered_items.sort(key=lambda kv: 0 if kv[1].get("symbol") == requested_symbol else 1)
                 for key, data_item in ordered_items:
                     data_type = data_item.get("type", "unknown")
-                    if data_type == "cryptocurrency_info":
+                    if data_type == _TYPE_CRYPTOCURRENCY_INFO:
                         name = data_item.get("name", "Unknown")
                         symbol = data_item.get("symbol", "N/A")
                         category = data_item.get("category", "N/A")
@@ -2900,7 +3569,7 @@ USER QUERY ADAPTATION:
                         
                         if data_item.get("urls", {}).get("website"):
                             context_parts.append(f"    Website: {data_item['urls']['website'][0]}")
-                    elif data_type == "market_data":
+                    elif data_type == _TYPE_MARKET_DATA:
                         name = data_item.get("name", "Unknown")
                         symbol = data_item.get("symbol", "N/A")
                         price = data_item.get("price")
@@ -2924,7 +3593,7 @@ USER QUERY ADAPTATION:
                             f"    🚨 PRICE: {_fmt_money(price, 8)} | CHANGE: {_fmt_pct(change_24h)} | CAP: {_fmt_money(market_cap, 0)}"
                         )
                     elif data_type == "dex_data":
-                        pairs_count = len(data_item.get("pairs", []))
+                        pairs_count = data_item.get("total_pairs", len(data_item.get("pairs", [])))
                         context_parts.append(f"  • DEX Trading Data: {pairs_count} trading pairs")
                         if data_item.get("pairs"):
                             top_pair = data_item["pairs"][0]
@@ -2934,8 +3603,6 @@ USER QUERY ADAPTATION:
             # Show RAW API DATA for verification
             context_parts.append("\n=== RAW API DATA FOR VERIFICATION ===")
             for result in tool_results:
-                if not isinstance(result, dict):
-                    continue
                 if result.get("success"):
                     source = result.get("source", "unknown")
                     data = result.get("data", {})
@@ -3014,9 +3681,6 @@ USER QUERY ADAPTATION:
         failed_tools = []
         
         for i, result in enumerate(tool_results):
-            if not isinstance(result, dict):
-                failed_tools.append(f"Tool {i+1}: Non-dict result")
-                continue
             source = result.get("source", f"Tool {i+1}")
             if result.get("success"):
                 successful_tools.append(source)
@@ -3142,7 +3806,7 @@ def _format_etherscan_data(data):
                 print(f"     Amount: {sample.get('value', 'N/A')}")
         elif isinstance(result, str) and result.isdigit():
             # Balance result
-            balance_eth = int(result) / 10**18
+            balance_eth = int(result) / _WEI_PER_ETH
             print(f"     Balance: {balance_eth:.6f} ETH")
 
 def _format_coinmarketcap_data(data):
@@ -3639,8 +4303,7 @@ async def main():
         print("👋 Thank you for using Web3 Research Agent!")
         
         # Cleanup
-        if http_client:
-            await http_client.aclose()
+        await close_http_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
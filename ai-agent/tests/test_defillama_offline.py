@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Offline checks for defillama_tool routing and caching, against a mocked upstream
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+
+os.environ.setdefault("GEMINI_API_KEY", "offline-test")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main
+from main import defillama_tool
+
+
+def _run_with_upstream(handler, coro_factory):
+    """Run coro_factory() on a fresh loop whose shared HTTP client talks to handler"""
+    async def runner():
+        loop = asyncio.get_running_loop()
+        main._http_clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await coro_factory()
+        finally:
+            await main.close_http_client()
+    main._defillama_cache.clear()
+    return asyncio.run(runner())
+
+
+def test_failed_aggregate_is_not_cached():
+    """An aggregate served during an outage must not mask DefiLlama's recovery"""
+    calls = []
+    upstream_up = False
+
+    def handler(request: httpx.Request):
+        calls.append(str(request.url))
+        if not upstream_up:
+            return httpx.Response(503, request=request)
+        return httpx.Response(200, json=[{"name": "Ethereum", "tvl": 1000.0}], request=request)
+
+    async def scenario():
+        nonlocal upstream_up
+        first = await defillama_tool.ainvoke({"query": "tvl overview"})
+        calls_during_outage = len(calls)
+        upstream_up = True
+        second = await defillama_tool.ainvoke({"query": "tvl overview"})
+        return first, calls_during_outage, second
+
+    first, calls_during_outage, second = _run_with_upstream(handler, scenario)
+    assert not first["success"], first
+    assert len(calls) > calls_during_outage, "recovered upstream was never queried"
+    assert second["success"], second
+    assert second["data"]["tvl"]["top_chains"][0]["name"] == "Ethereum"
+
+
+
+def test_pro_only_markers_match_spaced_and_joined_forms():
+    """Pro-only endpoint names are recognized as separate words or run together"""
+    for query in ("active users on aave", "activeusers", "lsd rates", "lsdrates",
+                  "historical liquidity for uniswap", "/historicalliquidity/uniswap",
+                  "token protocols", "tokenprotocols", "show defi hacks"):
+        assert main._names_pro_endpoint(query), query
+    for query in ("hacksaw", "tvl of arbitrum", "users of lsd"):
+        assert not main._names_pro_endpoint(query), query
+
+
+def test_pro_only_query_returns_pro_error():
+    """A spaced Pro-only query gets the Pro-only error, not the chains fallback"""
+    def handler(request: httpx.Request):
+        return httpx.Response(200, json=[{"name": "Ethereum", "tvl": 1000.0}], request=request)
+
+    result = _run_with_upstream(handler, lambda: defillama_tool.ainvoke({"query": "active users"}))
+    assert not result["success"], result
+    assert result["metadata"] == {"note": "pro-only endpoint"}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")